@@ -0,0 +1,445 @@
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import migrator
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+
+# Benchmark: python benchmark.py [options] [migrator options]
+# Runs migrate_workspaces() against local stand-ins for Trello and Planka (one HTTP server in a separate process, with
+# configurable latency and error rate) and a synthetic workspace, then reports requests, wall time and peak memory.
+# Nothing is sent to the real services; the output (journal, log, run report) goes to a temporary folder.
+
+# Settings that only make sense against real servers are not offered by the benchmark
+CONNECTION_SETTINGS = ("planka_url", "planka_username", "planka_password", "trello_apikey", "trello_apitoken")
+
+
+
+# Synthetic Trello workspace, indexed the way the endpoints read it
+
+# Function: build one workspace with the given number of boards, lists per board, cards per board and items per card
+def make_workspace(boards, lists, cards, archived, comments, checklist_items, attachments, attachment_kb, seed):
+    rng = random.Random(seed)
+    counter = iter(range(1, 1 << 62))
+    data = {
+        "workspace": None, "boards": [], "lists": {}, "labels": {}, "cards": {},
+        "board_cards": collections.defaultdict(list), "list_cards": collections.defaultdict(list),
+        "checklists": {}, "actions": {}, "board_actions": collections.defaultdict(list),
+    }
+
+    def new_id():
+        return f"{next(counter):024x}"  # Increasing, like Trello ids, so since/before paging works on them
+
+    workspace = {"id": new_id(), "name": "benchmark", "displayName": "Benchmark"}
+    data["workspace"] = workspace
+    for b in range(boards):
+        board = {"id": new_id(), "name": f"Board {b + 1}", "idOrganization": workspace["id"], "closed": False}
+        data["boards"].append(board)
+        labels = [{"id": new_id(), "idBoard": board["id"], "name": name, "color": color}
+                  for name, color in (("Bug", "red"), ("Feature", "green"), ("Later", None))]
+        data["labels"][board["id"]] = labels
+        board_lists = [{"id": new_id(), "name": f"List {l + 1}", "idBoard": board["id"], "pos": (l + 1) * 16384, "closed": False}
+                       for l in range(lists)]
+        for trello_list in board_lists:
+            data["lists"][trello_list["id"]] = trello_list
+
+        for c in range(cards + archived):
+            card_id = new_id()
+            trello_list = board_lists[c % lists]
+            card_attachments = [
+                {"id": new_id(), "name": f"file{a + 1}.bin", "fileName": f"file{a + 1}.bin", "isUpload": True,
+                 "mimeType": "application/octet-stream", "bytes": attachment_kb * 1024, "date": "2024-01-01T00:00:00.000Z"}
+                for a in range(attachments)
+            ]
+            card_labels = rng.sample(labels, rng.randint(0, len(labels)))
+            card = {
+                "id": card_id, "name": f"Card {c + 1}", "desc": "Benchmark card " * rng.randint(0, 20),
+                "idBoard": board["id"], "idList": trello_list["id"], "pos": (c + 1) * 1024, "closed": c >= cards,
+                "due": None, "dueComplete": False, "labels": card_labels, "idLabels": [label["id"] for label in card_labels],
+                "idAttachmentCover": card_attachments[0]["id"] if card_attachments else None,
+                "dateLastActivity": "2024-01-01T00:00:00.000Z",
+                "badges": {"attachments": attachments, "comments": comments, "checkItems": checklist_items},
+                "attachments": card_attachments,
+            }
+            data["cards"][card_id] = card
+            data["board_cards"][board["id"]].append(card)
+            if not card["closed"]:
+                data["list_cards"][trello_list["id"]].append(card)
+            data["checklists"][card_id] = [{
+                "id": new_id(), "idCard": card_id, "idBoard": board["id"], "name": "Checklist", "pos": 16384,
+                "checkItems": [{"id": new_id(), "name": f"Item {i + 1}", "state": "complete" if i % 2 else "incomplete", "pos": (i + 1) * 16384}
+                               for i in range(checklist_items)],
+            }] if checklist_items else []
+            # Newest first, like Trello returns actions
+            data["actions"][card_id] = [{
+                "id": new_id(), "type": "commentCard", "date": "2024-01-02T03:04:05.000Z",
+                "data": {"text": f"Comment {k + 1} " * rng.randint(1, 10), "card": {"id": card_id}, "board": {"id": board["id"]}},
+                "memberCreator": {"fullName": "Bench Mark", "username": "benchmark"},
+            } for k in range(comments)][::-1]
+            data["board_actions"][board["id"]].extend(data["actions"][card_id])
+        data["board_actions"][board["id"]].sort(key=lambda action: action["id"], reverse=True)
+    return data
+
+
+
+# Stand-in server: Trello under /trello/1/, Planka under /planka/api/, request counts under /stats
+
+class StandInState:
+    def __init__(self, data, latency, error_rate, seed):
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.created = collections.Counter()
+        self.next_id = 1000000
+        self.payloads = {}
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return str(self.next_id)
+
+    def fail(self):
+        if not self.error_rate:
+            return False
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    # Attachment bodies are shared per size instead of being built for every download
+    def payload(self, size):
+        if size not in self.payloads:
+            self.payloads[size] = b"x" * size
+        return self.payloads[size]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real services
+    disable_nagle_algorithm = True  # Headers and body are written separately; without this each response waits for a delayed ACK
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, item=None, body=None, headers=None):
+        body = body if body is not None else json.dumps(item).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def handle_request(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        body = self.read_body()
+        if url.path == "/stats":
+            with self.state.lock:
+                return self.reply(200, {"requests": self.state.requests, "errors": self.state.errors, "created": self.state.created})
+
+        backend, base = ("trello", "/trello/1/") if url.path.startswith("/trello/") else ("planka", "/planka/api/")
+        endpoint = migrator.get_endpoint(backend, method, url.path[len(base):])
+        with self.state.lock:
+            self.state.requests[f"{backend} {endpoint}"] += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.fail():
+            with self.state.lock:
+                self.state.errors[f"{backend} {endpoint}"] += 1
+            # 429 for anything that is not idempotent, so the migrator retries it like a real rate limit
+            status = 503 if backend == "planka" and method != "POST" else 429
+            return self.reply(status, {"message": "injected error"}, headers={"Retry-After": "0"})
+
+        path = url.path[len(base):].strip("/").split("/")
+        result = self.trello(path, query) if backend == "trello" else self.planka(method, path, body)
+        if result is None:
+            return self.reply(404, {"message": f"not found: {url.path}"})
+        if isinstance(result, bytes):
+            return self.reply(200, body=result)
+        self.reply(200, result)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def trello(self, path, query):
+        data = self.state.data
+        if path == ["members", "me", "organizations"]:
+            return [data["workspace"]]
+        if path[0] == "organizations" and path[2:] == ["boards"]:
+            return [{key: value for key, value in board.items()} for board in data["boards"]]
+        if path[0] == "boards":
+            board_id = path[1]
+            if len(path) == 2:
+                return self.nested_board(board_id, query)
+            if path[2] == "lists":
+                return [trello_list for trello_list in data["lists"].values() if trello_list["idBoard"] == board_id]
+            if path[2] == "labels":
+                return data["labels"][board_id]
+            if path[2] == "cards":
+                cards = [card for card in data["board_cards"][board_id] if card["closed"] == (query.get("filter") == "closed")]
+                return [self.card(card) for card in self.page(cards, query)]
+            if path[2] == "actions":
+                return self.page(data["board_actions"][board_id], query, 50)
+        if path[0] == "lists" and path[2:] == ["cards"]:
+            return [self.card(card) for card in data["list_cards"][path[1]]]
+        if path[0] == "cards" and path[1] in data["cards"]:
+            card = data["cards"][path[1]]
+            if len(path) == 2:
+                return self.card(card)
+            if path[2] == "actions":
+                return self.page(data["actions"][card["id"]], query, 50)
+            if path[2] == "checklists":
+                return data["checklists"][card["id"]]
+            if path[2] == "attachments" and len(path) == 3:
+                return card["attachments"]
+            if path[2] == "attachments" and "download" in path:
+                attachment = next((a for a in card["attachments"] if a["id"] == path[3]), None)
+                return self.state.payload(attachment["bytes"]) if attachment else None
+        return None
+
+    @staticmethod
+    def card(card):
+        return {key: value for key, value in card.items() if key != "attachments"}
+
+    @staticmethod
+    def page(items, query, default_limit=None):
+        if "limit" not in query and "before" not in query and not default_limit:
+            return items
+        # Paged like Trello: newest first, limited to what came before (or since) the given id
+        items = sorted(items, key=lambda item: item["id"], reverse=True)
+        if "since" in query:
+            items = [item for item in items if item["id"] > query["since"]]
+        if "before" in query:
+            items = [item for item in items if item["id"] < query["before"]]
+        return items[:int(query.get("limit", default_limit or len(items)))]
+
+    def nested_board(self, board_id, query):
+        data = self.state.data
+        board = next((board for board in data["boards"] if board["id"] == board_id), None)
+        if board is None:
+            return None
+        result = dict(board)
+        if query.get("lists"):
+            result["lists"] = [trello_list for trello_list in data["lists"].values() if trello_list["idBoard"] == board_id]
+        if query.get("labels"):
+            result["labels"] = data["labels"][board_id]
+        if query.get("cards"):
+            cards = data["board_cards"][board_id]
+            if query["cards"] != "all":
+                cards = [card for card in cards if card["closed"] == (query["cards"] == "closed")]
+            result["cards"] = [card if query.get("card_attachments") else self.card(card) for card in cards]
+        if query.get("checklists"):
+            result["checklists"] = [checklist for card in data["board_cards"][board_id] for checklist in data["checklists"][card["id"]]]
+        if query.get("actions"):
+            result["actions"] = data["board_actions"][board_id][:int(query.get("actions_limit", 50))]
+        return result
+
+    def planka(self, method, path, body):
+        if path == ["access-tokens"]:
+            return {"item": "benchmark-token"}
+        if path == ["users", "me"]:
+            return {"item": {"id": "1"}}
+        if method == "PATCH":
+            with self.state.lock:
+                self.state.created[f"{path[0]} (updated)"] += 1
+            return {"item": {"id": path[1]}}
+        if method == "POST":
+            with self.state.lock:
+                self.state.created[path[-1]] += 1
+            item = {"id": self.state.new_id()}
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                item.update(json.loads(body or b"{}"))
+            return {"item": item}
+        return None
+
+
+# Function: run the stand-in server in its own process until it is terminated; the port is sent back through the queue
+def serve_stand_ins(options, port_queue):
+    data = make_workspace(options["boards"], options["lists"], options["cards"], options["archived_cards"], options["comments"],
+                          options["checklist_items"], options["attachments"], options["attachment_kb"], options["seed"])
+    handler = type("Handler", (StandInHandler,), {"state": StandInState(data, options["latency"] / 1000, options["error_rate"], options["seed"])})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+
+# Benchmark run
+
+# Function: point every output path of the migrator into the given folder
+def use_output_dir(path):
+    os.makedirs(path, exist_ok=True)
+    migrator.BASE_DIR = path
+    migrator.LOG_FILE = os.path.join(path, "log.txt")
+    migrator.SQL_FILE = os.path.join(path, "output", "update_timestamps.sql")
+    migrator.CSV_FILE = os.path.join(path, "output", "update_timestamps.csv")
+    migrator.JOURNAL_FILE = os.path.join(path, "output", "migration_journal.sqlite3")
+    migrator.SNAPSHOT_DIR = os.path.join(path, "output", "snapshot")
+    migrator.REPORT_FILE = os.path.join(path, "output", "run_report.json")
+    migrator.TRACE_FILE = os.path.join(path, "output", "trace.json")
+    migrator.ATTACHMENT_CACHE_DIR = os.path.join(path, "output", "attachment_cache")
+
+# Function: peak resident memory in MB of this process (who=RUSAGE_SELF) or of the largest child process that has
+# ended (who=RUSAGE_CHILDREN); None where the platform does not report it
+def peak_memory_mb(who=None):
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KB elsewhere
+
+# Function: start the stand-ins, migrate the synthetic workspace and return the measurements
+def run_benchmark(options):
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    server = context.Process(target=serve_stand_ins, args=(options, port_queue), daemon=True)
+    server.start()
+    try:
+        base = f"http://127.0.0.1:{port_queue.get(timeout=600)}"
+        migrator.TRELLO_URL = f"{base}/trello/1/"
+        migrator.PLANKA_URL = f"{base}/planka/api"
+        migrator.USERNAME = migrator.PASSWORD = migrator.APIKEY = migrator.APITOKEN = "benchmark"
+
+        started = time.perf_counter()
+        migrator.migrate_workspaces()
+        seconds = time.perf_counter() - started
+        # The board processes have ended and been joined by now, the stand-in server is still running: the children's
+        # peak is that of the largest board process, without the server
+        peak_mb = peak_memory_mb()
+        board_process_mb = None
+        processes = min(migrator.BOARD_PROCESSES, options["boards"])
+        if processes > 1 and peak_mb is not None:
+            board_process_mb = peak_memory_mb(resource.RUSAGE_CHILDREN)
+            peak_mb += processes * board_process_mb  # Upper bound: every process at the peak of the largest one
+
+        with requests.get(f"{base}/stats", timeout=60) as response:
+            server_stats = response.json()
+    finally:
+        server.terminate()
+        server.join()
+
+    requests_total = sum(server_stats["requests"].values())
+    cards = migrator.progress.done["cards"]
+    return {
+        "workspace": {key: options[key] for key in ("boards", "lists", "cards", "archived_cards", "comments", "checklist_items",
+                                                    "attachments", "attachment_kb")},
+        "latency_ms": options["latency"],
+        "error_rate": options["error_rate"],
+        "seconds": round(seconds, 3),
+        "requests": requests_total,
+        "requests_per_second": round(requests_total / seconds, 1),
+        "cards_per_second": round(cards / seconds, 1),
+        "peak_memory_mb": round(peak_mb, 1) if peak_mb is not None else None,
+        "board_processes": processes,
+        "board_process_peak_memory_mb": round(board_process_mb, 1) if board_process_mb is not None else None,
+        "injected_errors": sum(server_stats["errors"].values()),
+        "retries": {backend: migrator.run_stats[f"retries_{backend}"] for backend in ("trello", "planka")},
+        "created": server_stats["created"],
+        "endpoints": dict(sorted(server_stats["requests"].items(), key=lambda item: -item[1])),
+        "run_report": migrator.REPORT_FILE,
+    }
+
+# Function: print the measurements of a run
+def print_results(results):
+    workspace = results["workspace"]
+    print(f"\nBenchmark: {workspace['boards']} boards x {workspace['cards']} cards ({workspace['archived_cards']} archived), "
+          f"{workspace['comments']} comments, {workspace['checklist_items']} checklist items, "
+          f"{workspace['attachments']} x {workspace['attachment_kb']} KB attachments per card; "
+          f"latency {results['latency_ms']} ms, error rate {results['error_rate']:.1%}")
+    print(f"Wall time: {results['seconds']:.2f} s, {results['cards_per_second']} cards/s")
+    print(f"Requests: {results['requests']} ({results['requests_per_second']}/s), injected errors: {results['injected_errors']}, "
+          f"retries: Trello {results['retries']['trello']}, Planka {results['retries']['planka']}")
+    if results["peak_memory_mb"] is None:
+        print("Peak memory: not available on this platform")
+    elif results["board_process_peak_memory_mb"] is not None:
+        print(f"Peak memory: {results['peak_memory_mb']} MB at most (coordinator and {results['board_processes']} board "
+              f"processes of up to {results['board_process_peak_memory_mb']} MB each)")
+    else:
+        print(f"Peak memory: {results['peak_memory_mb']} MB")
+    print("Requests per endpoint:")
+    for endpoint, count in results["endpoints"].items():
+        print(f"  {count:8} {endpoint}")
+    print("Created in Planka: " + ", ".join(f"{count} {kind}" for kind, count in sorted(results["created"].items())))
+    print(f"Latency per endpoint on the migrator side: {results['run_report']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python benchmark.py", description="Benchmark the migration against local Trello and Planka stand-ins.")
+    parser.add_argument("--boards", type=int, default=10, help="boards in the synthetic workspace")
+    parser.add_argument("--lists", type=int, default=5, help="lists per board")
+    parser.add_argument("--cards", type=int, default=500, help="open cards per board")
+    parser.add_argument("--archived-cards", type=int, default=0, help="archived cards per board")
+    parser.add_argument("--comments", type=int, default=3, help="comments per card")
+    parser.add_argument("--checklist-items", type=int, default=5, help="checklist items per card (one checklist)")
+    parser.add_argument("--attachments", type=int, default=1, help="attachments per card")
+    parser.add_argument("--attachment-kb", type=int, default=16, help="size of every attachment, KB")
+    parser.add_argument("--latency", type=float, default=20.0, help="delay of every response, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/503 (retried by the migrator)")
+    parser.add_argument("--trello-rate", type=float, default=None, help="Trello requests per second (default: unlimited, to measure the migrator itself)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic data and the injected errors")
+    parser.add_argument("--output", help="folder for the journal, log and run report (default: a new temporary folder)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    for option, (_, kind, help_text) in migrator.CLI_SETTINGS.items():
+        if option in CONNECTION_SETTINGS or option == "trello_rate":  # --trello-rate above defaults to unlimited
+            continue
+        flag = "--" + option.replace("_", "-")
+        if kind is bool:
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction, default=None, help=help_text)
+        else:
+            parser.add_argument(flag, type=str if kind is list else kind, default=None, help=help_text)
+    args = parser.parse_args(argv)
+
+    migrator.LOG_LEVEL = "summary"
+    migrator.BACKEND_LIMITS["trello"] = dict(migrator.BACKEND_LIMITS["trello"], rate=args.trello_rate, burst=None)
+    for option in migrator.CLI_SETTINGS:
+        value = getattr(args, option, None)
+        if value is not None and option != "trello_rate":
+            migrator.apply_setting(option, value)
+    use_output_dir(args.output or tempfile.mkdtemp(prefix="planka-benchmark-"))
+
+    results = run_benchmark(vars(args))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
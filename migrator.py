@@ -1,39 +1,332 @@
+import argparse
+import atexit
+import collections
+import concurrent.futures
+import csv
 import datetime
+import email.utils
+import hashlib
+import itertools
 import json
+import math
+import multiprocessing
 import os
+import queue
+import random
 import re
 import shutil
+import sqlite3
+import sys
 import tempfile
+import threading
+import time
 import urllib
+import uuid
 
 from tqdm import tqdm
 import requests
 import unidecode
 import urllib3
 
+try:
+    import psycopg2  # Optional: only needed to write directly to the Planka database
+    import psycopg2.extras
+except ImportError:
+    psycopg2 = None
+
 
 # Function: logging messages to a log file and output to the console and GUI
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(BASE_DIR, "log.txt")
 SQL_FILE = os.path.join(BASE_DIR, "output", "update_timestamps.sql")
+CSV_FILE = os.path.join(BASE_DIR, "output", "update_timestamps.csv")
+JOURNAL_FILE = os.path.join(BASE_DIR, "output", "migration_journal.sqlite3")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "output", "snapshot")
+ATTACHMENT_CACHE_DIR = os.path.join(BASE_DIR, "output", "attachment_cache")
+REPORT_FILE = os.path.join(BASE_DIR, "output", "run_report.json")
+PLAN_FILE = os.path.join(BASE_DIR, "output", "plan.json")
+TRACE_FILE = os.path.join(BASE_DIR, "output", "trace.json")
+
+# Messages are queued and written by a background thread in batches, so workers never wait on the file, console or GUI
+LOG_LEVEL = "entity"  # "entity": every created card, comment, task, label and attachment, "summary": boards, lists, errors and totals only
+LOG_BATCH_SIZE = 500  # Messages written (and passed to the GUI) at once
+
+log_gui = None  # Called from the writer thread with a block of lines; the GUI must hand it over to the Tk thread itself
+forward_queue = None  # In a board process: log lines and timestamps go to the coordinating process instead
+log_queue = queue.Queue()
+log_thread = None
+log_thread_lock = threading.Lock()
+
+def log_message(message, detail=False):
+    if detail and LOG_LEVEL == "summary":
+        return
+    start_log_writer()
+    log_queue.put(message)
+
+
+def start_log_writer():
+    global log_thread
+    if log_thread is not None and log_thread.is_alive():
+        return
+    with log_thread_lock:
+        if log_thread is None or not log_thread.is_alive():
+            log_thread = threading.Thread(target=write_log, name="log-writer", daemon=True)
+            log_thread.start()
 
-log_gui = None
-def log_message(message):
-    with open(LOG_FILE, "a", encoding="utf-8") as log:
-        log.write(message + "\n")
-    print(message)
-    if log_gui is not None:
+
+def write_log():
+    while True:
+        batch = [log_queue.get()]
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                batch.append(log_queue.get_nowait())
+            except queue.Empty:
+                break
+        text = "\n".join(batch)
         try:
-            log_gui(message)
-        except:
-            pass
+            if forward_queue is not None:
+                forward_queue.put(("log", text))
+            else:
+                with open(LOG_FILE, "a", encoding="utf-8") as log:
+                    log.write(text + "\n")
+                if progress_bar is not None:
+                    progress_bar.write(text)  # Keeps the progress bar below the log lines
+                else:
+                    print(text, flush=True)
+                if log_gui is not None:
+                    log_gui(text)
+        except Exception as e:
+            # The writer thread must go on, but the lines (often the errors) are not dropped silently
+            try:
+                sys.stderr.write(f"Writing the log failed ({e!r}):\n{text}\n")
+                sys.stderr.flush()
+            except Exception:
+                pass  # No stderr at all (windowed GUI build)
+        finally:
+            for _ in batch:
+                log_queue.task_done()
+
+
+# Block until every queued message has been written
+def flush_log():
+    if log_thread is not None and log_thread.is_alive():
+        log_queue.join()
+
+
+# Start a new log file, keeping the order of messages queued before
+def reset_log():
+    flush_log()
+    open(LOG_FILE, "w", encoding="utf-8").close()
+
 
+atexit.register(flush_log)
+
+
+# Function: create the output folders; called when a run starts, importing the module touches no files
+def prepare_output():
+    os.makedirs(os.path.join(BASE_DIR, "output", "attachments"), exist_ok=True)
+
+
+# Original creation timestamps, collected in memory and written as batched statements instead of one UPDATE per entity
+TIMESTAMP_FORMAT = "sql"  # "sql": batched UPDATEs in update_timestamps.sql, "csv": COPY-ready update_timestamps.csv
+TIMESTAMP_BATCH_SIZE = 1000  # Rows per UPDATE statement
+TIMESTAMP_DSN = None  # PostgreSQL connection string of the Planka database to apply the timestamps directly (needs psycopg2)
+
+class TimestampSink:
+    # append=False starts new files; a resumed run appends to the ones of the interrupted run
+    def __init__(self, output_format=None, batch_size=None, dsn=None, append=True):
+        self.output_format = output_format or TIMESTAMP_FORMAT
+        self.batch_size = batch_size or TIMESTAMP_BATCH_SIZE
+        self.rows = collections.defaultdict(list)  # (table, key column) → [(key, timestamp)]
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        if dsn:
+            if psycopg2 is None:
+                raise RuntimeError("Applying timestamps to PostgreSQL requires psycopg2 (pip install psycopg2-binary)")
+            self.connection = psycopg2.connect(dsn)
+
+        path = CSV_FILE if self.output_format == "csv" else SQL_FILE
+        new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        if self.output_format == "csv":
+            self.file = open(CSV_FILE, "w" if new_file else "a", encoding="utf-8", newline="")
+            self.csv = csv.writer(self.file)
+            if new_file:
+                self.csv.writerow(["table", "key_column", "key", "created_at"])
+        else:
+            self.file = open(SQL_FILE, "w" if new_file else "a", encoding="utf-8")
+            if new_file:
+                self.file.write("-- SQL script to update comment timestamps in Planka\n")
+                self.file.write("-- Generated by Trello to Planka migration script\n\n")
+                self.file.write("-- Generated on: " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n\n")
+
+    def add(self, table, key_column, key, timestamp):
+        key = str(key)
+        if not key.isdigit():  # Planka ids are bigints; anything else must not end up in the SQL
+            return
+        with self.lock:
+            self.rows[(table, key_column)].append((key, timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]))
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        statements = []
+        for (table, key_column), rows in self.rows.items():
+            if self.output_format == "csv":
+                self.csv.writerows((table, key_column, key, timestamp) for key, timestamp in rows)
+            values = ",\n    ".join(f"({key}, '{timestamp}')" for key, timestamp in rows)
+            statements.append(
+                f'UPDATE "public"."{table}" AS t SET "created_at" = v.created_at::timestamp\n'
+                f'FROM (VALUES\n    {values}\n) AS v(key, created_at)\n'
+                f'WHERE t."{key_column}" = v.key;\n'
+            )
+        if self.output_format != "csv":
+            self.file.writelines(statements)
+        self.file.flush()
+
+        if self.connection is not None and statements:
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+            self.connection.commit()
+
+        self.rows.clear()
+        self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self.flush_locked()
+            self.file.close()
+            if self.connection is not None:
+                self.connection.close()
+
+timestamp_sink = None
+timestamp_sink_lock = threading.Lock()
+
+# Function: open the sink for this run (it is also opened on first use)
+def open_timestamp_sink(append=True):
+    global timestamp_sink
+    with timestamp_sink_lock:
+        if timestamp_sink is None:
+            timestamp_sink = TimestampSink(dsn=TIMESTAMP_DSN, append=append)
+    return timestamp_sink
+
+# Function: queue an original creation timestamp for a Planka row (table, key column, key)
+def record_timestamp(table, key_column, key, timestamp):
+    if forward_queue is not None:
+        forward_queue.put(("timestamp", table, key_column, key, timestamp))
+    else:
+        open_timestamp_sink().add(table, key_column, key, timestamp)
+
+# Function: write out the remaining timestamps and close the sink
+def close_timestamp_sink():
+    global timestamp_sink
+    if timestamp_sink is not None:
+        timestamp_sink.close()
+        if timestamp_sink.connection is not None:
+            log_message("Original timestamps applied to the Planka database")
+    timestamp_sink = None
+
+
+# Direct inserts into the Planka database: the task lists, tasks and comments of a card are written in one transaction
+# instead of one API request each, and comments get their original creation date right away
+PLANKA_DSN = None  # PostgreSQL connection string of the Planka database (needs psycopg2); None = everything goes through the API
+PLANKA_DB_PAGE_SIZE = 1000  # Rows per INSERT statement
+
+class PlankaDatabase:
+    def __init__(self, dsn, user_id):
+        if psycopg2 is None:
+            raise RuntimeError("Writing to the Planka database requires psycopg2 (pip install psycopg2-binary)")
+        self.dsn = dsn
+        self.user_id = int(user_id)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.disabled = False  # Set after a failed write; the rest of the run uses the API
+
+    # Transactions can't be shared between threads, so every card worker gets its own connection
+    def connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = psycopg2.connect(self.dsn)
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    # task_lists: (Trello id, name, position), tasks: (Trello id, Trello checklist id, name, position, completed),
+    # comments: (Trello id, text, created at); task_list_ids maps the checklists created before. Returns Trello id → Planka id
+    def insert_card_contents(self, card_id, task_list_ids, task_lists, tasks, comments):
+        card_id = int(card_id)
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        connection = self.connect()
+        with connection, connection.cursor() as cursor:
+            # Ids come from Planka's own generator, so the rows can reference each other before they are inserted
+            cursor.execute("SELECT next_id() FROM generate_series(1, %s)", (len(task_lists) + len(tasks) + len(comments),))
+            new_ids = iter([row[0] for row in cursor.fetchall()])
+            task_list_ids = dict(task_list_ids)
+            inserted = {}
+
+            task_list_rows = []
+            for trello_id, name, position in task_lists:
+                inserted[trello_id] = task_list_ids[trello_id] = next(new_ids)
+                task_list_rows.append((inserted[trello_id], card_id, name, position, False, now))
+            task_rows = []
+            for trello_id, checklist_id, name, position, completed in tasks:
+                inserted[trello_id] = next(new_ids)
+                task_rows.append((inserted[trello_id], int(task_list_ids[checklist_id]), name, position, completed, now))
+            comment_rows = []
+            for trello_id, text, created_at in comments:
+                inserted[trello_id] = next(new_ids)
+                comment_rows.append((inserted[trello_id], card_id, self.user_id, text, created_at or now))
+
+            for table, columns, rows in (
+                ("task_list", "id, card_id, name, position, show_on_front_of_card, created_at", task_list_rows),
+                ("task", "id, task_list_id, name, position, is_completed, created_at", task_rows),
+                ("comment", "id, card_id, user_id, text, created_at", comment_rows),
+            ):
+                if rows:
+                    psycopg2.extras.execute_values(cursor, f'INSERT INTO "public"."{table}" ({columns}) VALUES %s', rows,
+                                                   page_size=PLANKA_DB_PAGE_SIZE)
+            if comment_rows:
+                cursor.execute('UPDATE "public"."card" SET "comments_total" = "comments_total" + %s WHERE "id" = %s',
+                               (len(comment_rows), card_id))
+
+        count_stat("db_task_lists", len(task_list_rows))
+        count_stat("db_tasks", len(task_rows))
+        count_stat("db_comments", len(comment_rows))
+        return inserted
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections.clear()
+
+planka_db = None
+
+# Function: connect to the Planka database if configured; comments are inserted on behalf of the logged-in user
+def open_planka_db():
+    global planka_db
+    if not PLANKA_DSN:
+        return None
+    response = planka_request("GET", "users/me")
+    response.raise_for_status()
+    planka_db = PlankaDatabase(PLANKA_DSN, response.json()["item"]["id"])
+    planka_db.connect()
+    log_message("Task lists, tasks and comments are inserted directly into the Planka database")
+    return planka_db
 
-os.makedirs(os.path.join(BASE_DIR, "output", "attachments"), exist_ok=True)
-with open(SQL_FILE, "w", encoding="utf-8") as sql_file:
-    sql_file.write("-- SQL script to update comment timestamps in Planka\n")
-    sql_file.write("-- Generated by Trello to Planka migration script\n\n")
-    sql_file.write("-- Generated on: " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n\n")
+def close_planka_db():
+    global planka_db
+    if planka_db is not None:
+        planka_db.close()
+    planka_db = None
 
 
 def get_trello_creation_time(trello_id):
@@ -41,8 +334,506 @@ def get_trello_creation_time(trello_id):
 
 
 def save_file(filename, data):
-    if data:
-        json.dump(data, open(os.path.join(BASE_DIR, "/output", filename), "w", encoding="utf-8"), indent=4, ensure_ascii=False)
+    if SAVE_RESPONSES and data:
+        with open(os.path.join(BASE_DIR, "output", filename), "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=4, ensure_ascii=False)
+
+
+
+# Run statistics shown in the summary at the end of the migration
+run_stats = collections.Counter()
+run_stats_lock = threading.Lock()
+
+def count_stat(name, amount=1):
+    with run_stats_lock:
+        run_stats[name] += amount
+
+
+
+# Live progress: totals from the pre-count, finished work, requests in flight and failed requests, rates and ETA.
+# In a board process every call is sent to the coordinating process, which holds the totals.
+class Progress:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.total = collections.Counter()
+            self.done = collections.Counter()
+            self.card_weights = {}  # Trello card id → (tasks, comments, attachment bytes)
+            self.in_flight = 0
+            self.errors = 0
+            self.started = time.monotonic()
+
+    def forwarded(self, *call):
+        if forward_queue is None:
+            return False
+        forward_queue.put(("progress",) + call)
+        return True
+
+    def add_total(self, kind, amount=1):
+        with self.lock:
+            self.total[kind] += amount
+
+    def add_card(self, card_id, tasks, comments, size):
+        with self.lock:
+            self.card_weights[card_id] = (tasks, comments, size)
+            self.total.update(cards=1, tasks=tasks, comments=comments, bytes=size)
+
+    def advance(self, kind, amount=1):
+        if self.forwarded("advance", kind, amount):
+            return
+        with self.lock:
+            self.done[kind] += amount
+
+    # Cards count with the tasks, comments and bytes found by the pre-count; cards it left out (unchanged in sync) don't count
+    def card_done(self, card_id):
+        if self.forwarded("card_done", card_id):
+            return
+        with self.lock:
+            if card_id in self.card_weights:
+                tasks, comments, size = self.card_weights[card_id]
+                self.done.update(cards=1, tasks=tasks, comments=comments, bytes=size)
+            elif not self.card_weights:
+                self.done["cards"] += 1
+
+    def request_started(self):
+        if self.forwarded("request_started"):
+            return
+        with self.lock:
+            self.in_flight += 1
+
+    def request_finished(self, failed):
+        if self.forwarded("request_finished", failed):
+            return
+        with self.lock:
+            self.in_flight -= 1
+            self.errors += failed
+
+    # Share of the counted cards that are done (0 without a pre-count)
+    def fraction(self):
+        with self.lock:
+            return min(1.0, self.done["cards"] / self.total["cards"]) if self.total["cards"] else 0.0
+
+    # Seconds left: the slowest of cards, tasks, comments and attachment bytes at their rate so far
+    def eta(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            remaining = [
+                (self.total[kind] - self.done[kind]) * elapsed / self.done[kind]
+                for kind in ("cards", "tasks", "comments", "bytes")
+                if self.total[kind] > self.done[kind] and self.done[kind]
+            ]
+        return max(remaining) if remaining else None
+
+    def status(self):
+        eta = self.eta()
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 0.001)
+            parts = [
+                f"boards {self.done['boards']}/{self.total['boards']}",
+                f"cards {self.done['cards']}/{self.total['cards'] or '?'}",
+                f"{self.done['cards'] / elapsed:.1f} cards/s, {self.done['tasks'] / elapsed:.1f} tasks/s, "
+                f"{self.done['comments'] / elapsed:.1f} comments/s, {self.done['bytes'] / elapsed / 1048576:.2f} MB/s",
+                f"in flight {self.in_flight}",
+                f"errors {self.errors}",
+            ]
+        if eta is not None:
+            parts.append("ETA " + str(datetime.timedelta(seconds=int(eta))))
+        return " | ".join(parts)
+
+progress = Progress()
+progress_bar = None
+PROGRESS_INTERVAL = 1.0  # Seconds between updates of the progress bar
+
+# Function: show a tqdm bar with the progress status in the console until stop is set (command line only)
+def show_progress(stop):
+    global progress_bar
+    progress_bar = tqdm(total=progress.total["cards"] or None, unit="card", dynamic_ncols=True)
+    try:
+        while not stop.wait(PROGRESS_INTERVAL):
+            progress_bar.n = progress.done["cards"]
+            progress_bar.set_postfix_str(progress.status(), refresh=True)
+        progress_bar.n = progress.done["cards"]
+        progress_bar.refresh()
+    finally:
+        progress_bar.close()
+        progress_bar = None
+
+
+
+# Connection settings (set by the GUI or the command line)
+PLANKA_URL = ""  # Including the /api suffix
+USERNAME = ""
+PASSWORD = ""
+APIKEY = ""
+APITOKEN = ""
+TRELLO_URL = "https://api.trello.com/1/"
+
+# Migration settings (the GUI overrides them before starting the migration)
+POOL_SIZE = 10  # Maximum number of kept-alive connections per backend
+CARD_WORKERS = 1  # Number of cards migrated in parallel (1 = sequential)
+PRECOUNT = True  # Count boards, cards, tasks, comments and attachment bytes first (one request per board), for the progress and ETA
+PROGRESS_BAR = False  # Show a progress bar in the console (the command line turns it on in a terminal)
+CARD_PAGE_SIZE = 1000  # Cards per request when reading the archive of a board (Trello's maximum)
+PREFETCH_CARDS = 16  # Cards whose checklists, comments and attachment lists are read from Trello ahead of their Planka writes (0 = off)
+PREFETCH_WORKERS = 2  # Threads reading those ahead
+CARD_QUEUE_SIZE = 4  # Cards waiting per card worker; the next archive page is read only when the workers catch up
+BOARD_PROCESSES = 1  # Number of boards migrated in parallel by separate processes, each with CARD_WORKERS threads (1 = in this process)
+BULK_FETCH = False  # Fetch each board with a few nested requests instead of per list and per card
+STREAM_ATTACHMENTS = False  # Pipe attachments from the Trello download straight into the Planka upload
+SAVE_ATTACHMENT_COPY = True  # Keep a copy of every attachment in output/attachments
+SAVE_RESPONSES = False  # Dump every Trello response as JSON to output (for debugging; `export` keeps a full snapshot)
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+ATTACHMENT_WORKERS = 1  # Number of attachments transferred in parallel (1 = one at a time inside the card)
+ATTACHMENT_MAX_INFLIGHT_MB = 512  # Upper bound for the size of all attachments being transferred at once
+ATTACHMENT_CACHE_MB = 0  # Downloaded attachments kept by content hash in output/attachment_cache, least recently used evicted first (0 = off)
+# Lossy, opt-in: reuse a cached file for another attachment with the same file name and size (cards copied from templates).
+# The content is guessed from the metadata, so a different file of the same name and size gets the cached one
+ATTACHMENT_CACHE_BY_NAME = False
+RESUME = True  # Continue from the journal of a previous run instead of starting from scratch
+SYNC_MODE = False  # Only push what changed in Trello since the previous run (needs the journal of that run)
+SYNC_CLOCK_MARGIN = datetime.timedelta(minutes=10)  # Sync window overlap, covers clock drift between this host and Trello
+PLANKA_VERIFY_SSL = False  # Planka is often self-hosted with a self-signed certificate
+REQUEST_TIMEOUT = (15, 300)  # Seconds to connect and to wait for data, so a stalled connection is retried instead of hanging
+
+# Rate limits and retries per backend. Trello allows 100 requests per 10 seconds per token, Planka has no limit.
+# A full bucket plus ten seconds of refill must stay within that: burst + 10 * rate <= 100
+BACKEND_LIMITS = {
+    "trello": {"rate": 9.0, "burst": 10, "retries": 5},  # rate: requests per second (None = unlimited)
+    "planka": {"rate": None, "burst": None, "retries": 5},
+}
+RETRY_BACKOFF = 1.0  # Base delay in seconds, doubled on every attempt (with random jitter)
+RETRY_BACKOFF_MAX = 60.0
+
+# Migration scope, applied before anything is fetched (empty = everything). Ids or names, names are case-insensitive
+INCLUDE_WORKSPACES = []
+EXCLUDE_WORKSPACES = []
+INCLUDE_BOARDS = []
+EXCLUDE_BOARDS = []
+INCLUDE_LISTS = []  # List names or ids; archived cards are kept if they belong to an included list
+EXCLUDE_LISTS = []
+CARDS_ACTIVE_SINCE = None  # "YYYY-MM-DD": only cards with activity on or after this day
+CARDS_ACTIVE_UNTIL = None  # "YYYY-MM-DD": only cards with activity on or before this day
+SKIP_ARCHIVED_CARDS = False
+MAX_ATTACHMENT_MB = None  # Larger attachments are skipped
+
+
+
+# Shared HTTP sessions: one pooled keep-alive session per backend
+trello_session = None
+planka_session = None
+
+# Function: create a requests session with a connection pool of the given size
+def create_session(pool_size, verify=True):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = verify
+    return session
+
+# Function: (re)create the Trello and Planka sessions from the current settings
+def init_sessions(pool_size=None):
+    global trello_session, planka_session
+    close_sessions()
+    # One pooled connection per thread that can make requests: the board loop, card workers, attachment workers (also the
+    # export's downloads) and the prefetch pool; with fewer, urllib3 drops connections and new ones are opened
+    threads = 1 + CARD_WORKERS + ATTACHMENT_WORKERS + (PREFETCH_WORKERS if PREFETCH_CARDS else 0)
+    pool_size = pool_size or max(POOL_SIZE, threads)
+
+    trello_session = create_session(pool_size)
+    trello_session.headers["Authorization"] = f'OAuth oauth_consumer_key="{APIKEY}", oauth_token="{APITOKEN}"'
+
+    planka_session = create_session(pool_size, verify=PLANKA_VERIFY_SSL)
+    planka_session.headers["Content-Type"] = "application/json"
+    if not PLANKA_VERIFY_SSL:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    rate_limiters.clear()  # Rebuilt from BACKEND_LIMITS on first use
+
+# Function: close both sessions and release their pooled connections
+def close_sessions():
+    global trello_session, planka_session
+    for session in (trello_session, planka_session):
+        if session is not None:
+            session.close()
+    trello_session = None
+    planka_session = None
+
+def get_trello_session():
+    if trello_session is None:
+        init_sessions()
+    return trello_session
+
+def get_planka_session():
+    if planka_session is None:
+        init_sessions()
+    return planka_session
+
+# Function: store the Planka Bearer token on the session so every request carries it
+def set_planka_token(token):
+    get_planka_session().headers["Authorization"] = f"Bearer {token}"
+
+# Token bucket shared by all threads talking to one backend; a Retry-After pauses every caller
+class RateLimiter:
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif not self.rate:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+rate_limiters = {}
+
+def get_rate_limiter(backend):
+    if backend not in rate_limiters:
+        limits = BACKEND_LIMITS[backend]
+        rate_limiters[backend] = RateLimiter(limits.get("rate"), limits.get("burst"))
+    return rate_limiters[backend]
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Function: delay before the next attempt: the server's Retry-After if given, otherwise exponential backoff with jitter
+def get_retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_BACKOFF_MAX)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return min(max((retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds(), 0), RETRY_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+# Every HTTP attempt is timed per endpoint ("GET cards/{id}/actions") into a latency histogram with byte and retry counts.
+# The totals go to output/run_report.json; with TRACE each request is also written to output/trace.json
+# (Chrome trace format, open it in chrome://tracing or https://ui.perfetto.dev).
+TRACE = False
+LATENCY_BUCKET_RATIO = 1.1  # Histogram buckets grow by 10%, so percentiles are accurate to about 5%
+
+ENDPOINT_ID = re.compile(r"(?<=/)(?:[0-9a-f]{24}|\d+)(?=/|$)")
+ENDPOINT_FILE_NAME = re.compile(r"(?<=/download/).+$")
+
+# Function: endpoint of a request url, relative to the backend's base and with ids and file names replaced
+def get_endpoint(backend, method, url):
+    base = TRELLO_URL if backend == "trello" else PLANKA_URL + "/"
+    path = url[len(base):] if url.startswith(base) else urllib.parse.urlsplit(url).path
+    path = ENDPOINT_FILE_NAME.sub("{name}", ENDPOINT_ID.sub("{id}", "/" + path.split("?", 1)[0].strip("/")))
+    return f"{method.upper()} {path[1:]}"
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.trace = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.started = time.time()
+
+    def endpoint(self, backend, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = {"backend": backend, "requests": 0, "errors": 0, "retries": 0, "seconds": 0.0,
+                                    "max_seconds": 0.0, "bytes_sent": 0, "bytes_received": 0, "buckets": collections.Counter()}
+        return self.endpoints[name]
+
+    def record(self, backend, name, started, seconds, status, sent, received):
+        with self.lock:
+            stats = self.endpoint(backend, name)
+            stats["requests"] += 1
+            stats["errors"] += not status or status >= 400
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["bytes_sent"] += sent
+            stats["bytes_received"] += received
+            stats["buckets"][int(math.log(max(seconds, 0.0001) / 0.0001, LATENCY_BUCKET_RATIO))] += 1
+        if TRACE:
+            event = {"name": name, "cat": backend, "ph": "X", "ts": int(started * 1000000), "dur": int(seconds * 1000000),
+                     "pid": os.getpid(), "tid": threading.get_ident(), "args": {"status": status, "sent": sent, "received": received}}
+            if forward_queue is not None:
+                forward_queue.put(("trace", event))
+            else:
+                self.write_trace(event)
+
+    def retry(self, backend, name):
+        with self.lock:
+            self.endpoint(backend, name)["retries"] += 1
+
+    # Statistics of a board process, handed to the coordinator and cleared
+    def take(self):
+        with self.lock:
+            endpoints, self.endpoints = self.endpoints, {}
+        return endpoints
+
+    def merge(self, endpoints):
+        with self.lock:
+            for name, other in endpoints.items():
+                stats = self.endpoint(other["backend"], name)
+                for key in ("requests", "errors", "retries", "seconds", "bytes_sent", "bytes_received"):
+                    stats[key] += other[key]
+                stats["max_seconds"] = max(stats["max_seconds"], other["max_seconds"])
+                stats["buckets"].update(other["buckets"])
+
+    # Upper bound (seconds) of the bucket holding the given share of the requests
+    @staticmethod
+    def percentile(buckets, share):
+        rank = share * sum(buckets.values())
+        seen = 0
+        for bucket in sorted(buckets):
+            seen += buckets[bucket]
+            if seen >= rank:
+                return 0.0001 * LATENCY_BUCKET_RATIO ** (bucket + 1)
+        return 0.0
+
+    def report(self):
+        endpoints = {}
+        with self.lock:
+            for name, stats in sorted(self.endpoints.items(), key=lambda item: -item[1]["seconds"]):
+                endpoints[name] = {key: value for key, value in stats.items() if key != "buckets"}
+                endpoints[name]["mean_seconds"] = stats["seconds"] / stats["requests"] if stats["requests"] else 0.0
+                for label, share in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                    endpoints[name][f"{label}_seconds"] = min(self.percentile(stats["buckets"], share), stats["max_seconds"])
+        return endpoints
+
+    def open_trace(self, path):
+        with self.lock:
+            self.trace = open(path, "w", encoding="utf-8")
+            self.trace.write("[\n")
+            self.trace_events = 0
+
+    def write_trace(self, event):
+        with self.lock:
+            if self.trace is not None:
+                self.trace.write(("," if self.trace_events else "") + json.dumps(event) + "\n")
+                self.trace_events += 1
+
+    def close_trace(self):
+        with self.lock:
+            if self.trace is not None:
+                self.trace.write("]\n")
+                self.trace.close()
+                self.trace = None
+
+request_metrics = RequestMetrics()
+
+# Function: write output/run_report.json (settings, statistics, progress and the requests per endpoint) and log the slowest endpoints
+def write_run_report(started):
+    endpoints = request_metrics.report()
+    report = {
+        "started": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "seconds": round(time.time() - started, 3),
+        "settings": {name: globals()[name] for name in ("POOL_SIZE", "CARD_WORKERS", "BOARD_PROCESSES", "ATTACHMENT_WORKERS",
+                                                        "BULK_FETCH", "STREAM_ATTACHMENTS", "BACKEND_LIMITS")},
+        "stats": dict(run_stats),
+        "progress": {"total": dict(progress.total), "done": dict(progress.done)},
+        "attachments": {"files": attachment_meter.files, "bytes": attachment_meter.total_bytes, "mb_per_second": attachment_meter.rate()},
+        "backends": {},
+        "endpoints": endpoints,
+    }
+    for stats in endpoints.values():
+        backend = report["backends"].setdefault(stats["backend"], collections.Counter())
+        backend.update({key: stats[key] for key in ("requests", "errors", "retries", "seconds", "bytes_sent", "bytes_received")})
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for backend, stats in report["backends"].items():
+        log_message(f"{backend.capitalize()}: {stats['requests']} requests, {stats['errors']} failed, {stats['retries']} retried, "
+                    f"{stats['seconds']:.1f} s, {stats['bytes_received'] / 1048576:.2f} MB received, {stats['bytes_sent'] / 1048576:.2f} MB sent")
+    for name, stats in list(endpoints.items())[:5]:
+        log_message(f"  {name}: {stats['requests']} requests, {stats['seconds']:.1f} s, p50 {stats['p50_seconds'] * 1000:.0f} ms, "
+                    f"p95 {stats['p95_seconds'] * 1000:.0f} ms, p99 {stats['p99_seconds'] * 1000:.0f} ms")
+    log_message(f"Run report: {REPORT_FILE}" + (f", trace: {TRACE_FILE}" if TRACE else ""))
+
+# Function: send a request through the backend's rate limiter, retrying 429 responses and transient errors.
+# Non-idempotent requests (POST) are only retried when the server surely did not process them (429, connect timeout);
+# retry=False disables retries for bodies that cannot be replayed, such as streamed uploads.
+def send_request(backend, session, method, url, retry=True, **kwargs):
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    limiter = get_rate_limiter(backend)
+    retries = BACKEND_LIMITS[backend].get("retries", 0) if retry else 0
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            response = tracked_request(backend, session, method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            connect_failed = isinstance(e, requests.exceptions.ConnectTimeout)
+            if attempt >= retries or not (idempotent or connect_failed):
+                raise
+            delay = get_retry_delay(None, attempt)
+            log_message(f"{backend}: {method} {url} failed ({e.__class__.__name__}), retrying in {delay:.1f} s ({attempt + 1}/{retries})")
+        else:
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= retries:
+                return response
+            delay = get_retry_delay(response, attempt)
+            if response.status_code == 429:
+                limiter.pause(delay)  # Over the limit: every thread waits, not only this one
+            log_message(f"{backend}: {method} {url} returned {response.status_code}, retrying in {delay:.1f} s ({attempt + 1}/{retries})")
+            response.close()
+        count_stat(f"retries_{backend}")
+        request_metrics.retry(backend, get_endpoint(backend, method, url))
+        time.sleep(delay)
+
+# Function: one HTTP attempt, counted in the progress as in flight and timed per endpoint until the response
+# (only its headers for stream=True) arrives
+def tracked_request(backend, session, method, url, **kwargs):
+    progress.request_started()
+    started, timer = time.time(), time.perf_counter()
+    response = None
+    try:
+        response = session.request(method, url, **kwargs)
+        return response
+    finally:
+        seconds = time.perf_counter() - timer
+        progress.request_finished(response is None or response.status_code >= 400)
+        status, sent, received = 0, 0, 0
+        if response is not None:
+            status = response.status_code
+            body = response.request.body
+            sent = len(body) if isinstance(body, (bytes, str)) else int(response.request.headers.get("Content-Length") or 0)
+            received = int(response.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(response.content)
+        request_metrics.record(backend, get_endpoint(backend, method, url), started, seconds, status, sent, received)
+
+# Function: send a request to Trello; url is either relative to TRELLO_URL or absolute
+def trello_request(method, url, **kwargs):
+    if not url.startswith("http"):
+        url = f"{TRELLO_URL}{url}"
+    return send_request("trello", get_trello_session(), method, url, **kwargs)
+
+# Function: send a request to Planka; path is relative to PLANKA_URL
+def planka_request(method, path, **kwargs):
+    return send_request("planka", get_planka_session(), method, f"{PLANKA_URL}/{path}", **kwargs)
 
 
 
@@ -50,98 +841,150 @@ def save_file(filename, data):
 
 # Function: get a list of Trello workspaces
 def get_workspaces():
-    url = f"{TRELLO_URL}members/me/organizations"
-    params = {"key": APIKEY, "token": APITOKEN}
-    response = requests.get(url, params=params)
+    response = trello_request("GET", "members/me/organizations")
     response.raise_for_status()
     save_file("workspaces.json", response.json())
     return response.json()
 
 # Function: get list of boards from Trello
 def get_boards(workspace_id):
-    url = f"{TRELLO_URL}organizations/{workspace_id}/boards"
-    params = {"key": APIKEY, "token": APITOKEN}
-    response = requests.get(url, params=params)
+    response = trello_request("GET", f"organizations/{workspace_id}/boards")
     response.raise_for_status()
     save_file(f"boards_{workspace_id}.json", response.json())
     return response.json()
 
 # Function: retrieve list from Trello
 def get_lists(board_id):
-    url = f"{TRELLO_URL}boards/{board_id}/lists"
-    params = {"key": APIKEY, "token": APITOKEN}
-    response = requests.get(url, params=params)
+    response = trello_request("GET", f"boards/{board_id}/lists")
     response.raise_for_status()
     save_file(f"lists_{board_id}.json", response.json())
     return response.json()
 
-# Function: retrieve cards from Trello
+# Function: yield a Trello collection page by page, each request asking for what comes `before` the oldest id so far.
+# A short page is the last one; a page that does not go further back (paging not supported) ends it as well
+def iter_pages(url, params=None, page_size=None, name=None):
+    page_size = page_size or CARD_PAGE_SIZE
+    params = dict(params or {}, limit=page_size)
+    for number in itertools.count(1):
+        response = trello_request("GET", url, params=params)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            return
+        if name:
+            save_file(f"{name}_{number}.json" if number > 1 else f"{name}.json", page)
+        oldest = min(item["id"] for item in page)
+        if "before" in params and oldest >= params["before"]:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        params["before"] = oldest
+
+# Function: retrieve cards from Trello, in the list's order
 def get_cards(list_id):
-    url = f"{TRELLO_URL}lists/{list_id}/cards"
-    params = {"key": APIKEY, "token": APITOKEN}
-    response = requests.get(url, params=params)
+    response = trello_request("GET", f"lists/{list_id}/cards")
     response.raise_for_status()
     save_file(f"cards_{list_id}.json", response.json())
     return response.json()
 
-def get_archived_cards(board_id):
-    url = f"{TRELLO_URL}boards/{board_id}/cards"
-    params = {"key": APIKEY, "token": APITOKEN, "filter": "closed"}
-    response = requests.get(url, params=params)
+# Function: yield the archived cards of a board as their pages arrive; archives of old boards are too big to hold at once
+def iter_archived_cards(board_id):
+    for page in iter_pages(f"boards/{board_id}/cards", {"filter": "closed"}, name=f"archived_cards_{board_id}"):
+        yield from page
+
+# Function: retrieve all labels of a board from Trello, in the board's order
+def get_board_labels(board_id):
+    response = trello_request("GET", f"boards/{board_id}/labels", params={"limit": 1000})
     response.raise_for_status()
-    save_file(f"archived_cards_{board_id}.json", response.json())
+    save_file(f"labels_{board_id}.json", response.json())
     return response.json()
 
-# Function: retrieves card comments from Trello
-def get_card_comments(card_id):
-    url = f"{TRELLO_URL}cards/{card_id}/actions"
-    params = {"key": APIKEY, "token": APITOKEN, "filter": "commentCard", "limit": 50}
-
-    all_comments = []
-    while True:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        comments = response.json()
-
-        if not comments:
-            break
-
-        all_comments.extend(comments)
-        params["before"] = comments[-1]["id"]
-
-    save_file(f"comments_{card_id}.json", all_comments)
-    return all_comments
+# Function: retrieves card comments from Trello (only those posted after `since` if given)
+def get_card_comments(card_id, since=None):
+    params = {"filter": "commentCard"}
+    if since:
+        params["since"] = since
+    # Comments are posted oldest first, so the pages (newest first) are joined before any is used
+    return [comment for page in iter_pages(f"cards/{card_id}/actions", params, 50, f"comments_{card_id}") for comment in page]
 
 # Function: retrieves all checklists (task list) from a Trello card
 def get_card_checklists(card_id):
-    url = f"{TRELLO_URL}cards/{card_id}/checklists"
-    params = {"key": APIKEY, "token": APITOKEN}
-    response = requests.get(url, params=params)
+    response = trello_request("GET", f"cards/{card_id}/checklists")
     response.raise_for_status()
     save_file(f"checklists_{card_id}.json", response.json())
     return response.json()
 
 # Function: get attachments from cards from Trello
-def get_card_attachments(card_id, APIKEY, APITOKEN):
-    url = f"https://api.trello.com/1/cards/{card_id}/attachments"
-    params = {
-        "key": APIKEY,
-        "token": APITOKEN
-    }
-    response = requests.get(url, params=params)
+def get_card_attachments(card_id):
+    response = trello_request("GET", f"cards/{card_id}/attachments")
     response.raise_for_status()
     save_file(f"attachments_{card_id}.json", response.json())
     return response.json()
 
-# Function: gets the ID of an attachment that is a card cover in Trello to transfer it as a cover to a card in Planka
-def get_card_cover_attachment_id(card_id):
-    url = f"{TRELLO_URL}cards/{card_id}"
-    params = {"key": APIKEY, "token": APITOKEN, "fields": "idAttachmentCover"}
-    response = requests.get(url, params=params)
+# Function: retrieves all comments of a board, 1000 per request (only those posted after `since` if given)
+def get_board_comments(board_id, since=None):
+    params = {"filter": "commentCard"}
+    if since:
+        params["since"] = since
+    return [comment for page in iter_pages(f"boards/{board_id}/actions", params, 1000) for comment in page]
+
+# Function: fetch a whole board (lists, cards, checklists, attachments, labels and comments) in a few requests
+def get_board_snapshot(board_id, since=None):
+    return index_board_snapshot(*fetch_board(board_id, since))
+
+# Function: fetch the nested board and its comments as Trello returns them
+def fetch_board(board_id, since=None):
+    params = {
+        "fields": "name",
+        "lists": "open",
+        "cards": "all",
+        "card_attachments": "true",
+        "checklists": "all",
+        "labels": "all",
+        "labels_limit": 1000,
+    }
+    response = trello_request("GET", f"boards/{board_id}", params=params)
     response.raise_for_status()
-    if response.json().get("idAttachmentCover"):
-        save_file(f"card_cover_attachment_{card_id}.json", response.json())
-    return response.json().get("idAttachmentCover")
+    board = response.json()
+    save_file(f"board_{board_id}.json", board)
+
+    comments = get_board_comments(board_id, since)
+    save_file(f"board_comments_{board_id}.json", comments)
+    return board, comments
+
+# Function: index a nested board by list id and card id, in the same shape and order as the per-card requests return
+def index_board_snapshot(board, comments):
+    snapshot = {
+        "lists": board.get("lists", []),
+        "labels": board.get("labels", []),
+        "cards": {trello_list["id"]: [] for trello_list in board.get("lists", [])},
+        "archived_cards": [],
+        "attachments": {},
+        "checklists": {},
+        "comments": {},
+    }
+
+    for card in board.get("cards", []):
+        snapshot["attachments"][card["id"]] = card.pop("attachments", [])
+        if card.get("closed"):
+            snapshot["archived_cards"].append(card)
+        elif card.get("idList") in snapshot["cards"]:
+            snapshot["cards"][card["idList"]].append(card)
+    for cards in snapshot["cards"].values():
+        cards.sort(key=lambda card: card.get("pos", 0))
+
+    for checklist in sorted(board.get("checklists", []), key=lambda checklist: checklist.get("pos", 0)):
+        checklist.get("checkItems", []).sort(key=lambda item: item.get("pos", 0))
+        snapshot["checklists"].setdefault(checklist["idCard"], []).append(checklist)
+
+    # Comments stay newest first, like cards/{id}/actions returns them
+    for comment in comments:
+        card_id = comment.get("data", {}).get("card", {}).get("id")
+        if card_id:
+            snapshot["comments"].setdefault(card_id, []).append(comment)
+
+    return snapshot
 
 
 
@@ -149,15 +992,14 @@ def get_card_cover_attachment_id(card_id):
 
 # Function: authenticate and retrieve a Bearer token for Planka
 def get_token():
-    url = f"{PLANKA_URL}/access-tokens"
     payload = {"emailOrUsername": USERNAME, "password": PASSWORD}
-    headers = {"Content-Type": "application/json"}
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", "access-tokens", json=payload)
         response.raise_for_status()
         data = response.json()
         for key in ["token", "item", "id"]:
             if key in data:
+                set_planka_token(data[key])
                 return data[key]
     except requests.RequestException as e:
         log_message(f"Error while retrieving token: {e}")
@@ -166,11 +1008,7 @@ def get_token():
 
 # Function: create a project in Planka based on Trello workspace
 def create_planka_project(trello_ws, token):
-    url = f"{PLANKA_URL}/projects"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = "projects"
 
     description = trello_ws.get("name", "")
     if not description.strip():
@@ -183,7 +1021,7 @@ def create_planka_project(trello_ws, token):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
         project = response.json()["item"]
         log_message(f"Project '{payload['name']}' created successfully")
@@ -194,11 +1032,7 @@ def create_planka_project(trello_ws, token):
 
 # Function: create a board in Planka for the given project
 def create_planka_board(project_id, project_name, board_data, token, position=65536):
-    url = f"{PLANKA_URL}/projects/{project_id}/boards"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = f"projects/{project_id}/boards"
 
     name = board_data.get("name", "Unnamed Board")[:128]
 
@@ -208,7 +1042,7 @@ def create_planka_board(project_id, project_name, board_data, token, position=65
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
         log_message(f"Board '{name}' created in project '{project_name}'")
         return response.json()["item"]
@@ -219,11 +1053,7 @@ def create_planka_board(project_id, project_name, board_data, token, position=65
 
 # Function: create a list in Planka for the given board
 def create_planka_list(board_id, board_name, list_data, token, position=65536):
-    url = f"{PLANKA_URL}/boards/{board_id}/lists"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = f"boards/{board_id}/lists"
 
     name = list_data.get("name", "Unnamed List")[:128]
 
@@ -237,7 +1067,7 @@ def create_planka_list(board_id, board_name, list_data, token, position=65536):
         payload["type"] = list_data["card_type"]
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
         log_message(f"List '{name}' created in board '{board_name}'")
         return response.json()["item"]
@@ -248,11 +1078,7 @@ def create_planka_list(board_id, board_name, list_data, token, position=65536):
 
 # Function: create a card in Planka under a specified list
 def create_planka_card(list_id, list_name, card_data, token, position=65536):
-    url = f"{PLANKA_URL}/lists/{list_id}/cards"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = f"lists/{list_id}/cards"
 
     name = card_data.get("name", "Unnamed Card")[:1024]
     description = card_data.get("desc", "")
@@ -269,19 +1095,15 @@ def create_planka_card(list_id, list_name, card_data, token, position=65536):
 
     if due_date:
         payload["dueDate"] = due_date
-        log_message(f"Due date set for card '{name}': {due_date}")
+        log_message(f"Due date set for card '{name}': {due_date}", detail=True)
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
-        log_message(f"Card '{name}' created in list '{list_name}'")
-
-        # Parse the Trello date format and convert to PostgreSQL format
-        with open(SQL_FILE, "a", encoding="utf-8") as sql_file:
-            formatted_sql_date = get_trello_creation_time(card_data["id"]).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-            comment_id = response.json()["item"]["id"]
-            sql_file.write(f'UPDATE "public"."action" SET "created_at" = \'{formatted_sql_date}\' WHERE "card_id" = {comment_id};\n')
+        log_message(f"Card '{name}' created in list '{list_name}'", detail=True)
 
+        # The card creation date is encoded in the Trello id
+        record_timestamp("action", "card_id", response.json()["item"]["id"], get_trello_creation_time(card_data["id"]))
 
         return response.json()["item"]
     except requests.RequestException as e:
@@ -289,52 +1111,42 @@ def create_planka_card(list_id, list_name, card_data, token, position=65536):
         log_message(f"Server response: {response.text}")
         return None
 
-# Function: create a comment in a Planka card (with optional Trello metadata)
-def create_planka_comment(card_id, comment_text, token, author_name=None, author_username=None, date=None, attachment_ids=None):
-    if author_name and author_username and date:
-        try:
-            formatted_date = datetime.datetime.fromisoformat(date.replace("Z", "")).strftime("%d-%m-%Y %H:%M:%S")
-        except ValueError:
-            formatted_date = date
-
-        if attachment_ids:
-            for trello_id, planka_id in attachment_ids.items():
-                if trello_id in comment_text:
-                    # Convert Trello attachment links to Planka attachment links
-                    comment_text = re.sub(
-                        rf"https://trello\.com/1/cards/[^/]+/attachments/{trello_id}/download/",
-                        f"{PLANKA_URL.strip('/api')}/attachments/{planka_id}/download/",
-                        comment_text
-                    )
-                    log_message(f"Converted Trello attachment link in comment to Planka link: {trello_id} → {planka_id}")
-
-        comment_text = f"""{comment_text}
+# Function: update fields of an existing Planka card (used by the sync mode)
+def update_planka_card(card_id, list_id, card_data, token, position=65536):
+    description = card_data.get("desc", "")
+    payload = {
+        "name": card_data.get("name", "Unnamed Card")[:1024],
+        "description": description if description.strip() else None,
+        "dueDate": card_data.get("due"),
+        "listId": list_id,
+        "position": position,
+    }
 
----
-*Imported comment from Trello, originally posted by*  
-{author_name} ({author_username})  
-{formatted_date}"""
+    try:
+        response = planka_request("PATCH", f"cards/{card_id}", json=payload)
+        response.raise_for_status()
+        log_message(f"Card '{payload['name']}' updated", detail=True)
+        return response.json()["item"]
+    except requests.RequestException as e:
+        log_message(f"Error updating card '{payload['name']}': {e}")
+        return None
 
-    url = f"{PLANKA_URL}/cards/{card_id}/comments"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+# Function: create a comment in a Planka card (with optional Trello metadata)
+def create_planka_comment(card_id, comment_text, token, author_name=None, author_username=None, date=None, attachment_ids=None):
+    comment_text = format_comment_text(comment_text, author_name, author_username, date, attachment_ids)
+    path = f"cards/{card_id}/comments"
     payload = {
         "text": comment_text[:1048576],
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
-        log_message("Comment added")
+        log_message("Comment added", detail=True)
 
         if date and response.json().get("item", {}).get("id"):
-            # Parse the Trello date format and convert to PostgreSQL format
-            with open(SQL_FILE, "a", encoding="utf-8") as sql_file:
-                formatted_sql_date = datetime.datetime.fromisoformat(date.replace("Z", "")).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                comment_id = response.json()["item"]["id"]
-                sql_file.write(f'UPDATE "public"."comment" SET "created_at" = \'{formatted_sql_date}\' WHERE "id" = {comment_id};\n')
+            # Parse the Trello date format and queue it for the PostgreSQL update
+            record_timestamp("comment", "id", response.json()["item"]["id"], datetime.datetime.fromisoformat(date.replace("Z", "")))
 
         return response.json()["item"]
     except requests.RequestException as e:
@@ -342,13 +1154,51 @@ def create_planka_comment(card_id, comment_text, token, author_name=None, author
         log_message(f"Server response: {response.text}")
         return None
 
+# Trello attachment links in comments, matched in one pass whatever the number of attachments
+TRELLO_ATTACHMENT_LINK = re.compile(r"https://(?:api\.)?trello\.com/1/cards/[^/\s]+/attachments/([0-9a-f]{24})/download/")
+
+# Function: Planka address without the /api suffix, as used in links
+def get_planka_base_url():
+    return PLANKA_URL[:-len("/api")] if PLANKA_URL.endswith("/api") else PLANKA_URL
+
+# Function: point Trello attachment links to the Planka attachments, in a single pass over the text. Links to attachments
+# of the card itself are resolved from attachment_ids, others (other cards, other boards) from the journal
+def rewrite_attachment_links(comment_text, attachment_ids=None):
+    attachment_ids = attachment_ids or {}
+    planka_base_url = get_planka_base_url()
+
+    def replace(match):
+        trello_id = match.group(1)
+        planka_id = attachment_ids.get(trello_id) or journal_get("attachment", trello_id)
+        if not planka_id:
+            return match.group(0)  # Not migrated (yet): the Trello link stays
+        log_message(f"Converted Trello attachment link in comment to Planka link: {trello_id} → {planka_id}", detail=True)
+        return f"{planka_base_url}/attachments/{planka_id}/download/"
+
+    return TRELLO_ATTACHMENT_LINK.sub(replace, comment_text)
+
+# Function: comment text with Trello attachment links pointing to Planka and the original author and date appended
+def format_comment_text(comment_text, author_name=None, author_username=None, date=None, attachment_ids=None):
+    if author_name and author_username and date:
+        try:
+            formatted_date = datetime.datetime.fromisoformat(date.replace("Z", "")).strftime("%d-%m-%Y %H:%M:%S")
+        except ValueError:
+            formatted_date = date
+
+        comment_text = rewrite_attachment_links(comment_text, attachment_ids)
+
+        comment_text = f"""{comment_text}
+
+---
+*Imported comment from Trello, originally posted by*  
+{author_name} ({author_username})  
+{formatted_date}"""
+
+    return comment_text
+
 # Function: create a checklist in a Planka card
 def create_planka_task_list(card_id, checklist_data, token, position=65536):
-    url = f"{PLANKA_URL}/cards/{card_id}/task-lists"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = f"cards/{card_id}/task-lists"
 
     name = checklist_data.get("name", "Unnamed Checklist")[:128]
 
@@ -359,9 +1209,9 @@ def create_planka_task_list(card_id, checklist_data, token, position=65536):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
-        log_message(f"Checklist '{name}' created")
+        log_message(f"Checklist '{name}' created", detail=True)
         return response.json()["item"]
     except requests.RequestException as e:
         log_message(f"Error creating checklist '{name}': {e}")
@@ -370,11 +1220,7 @@ def create_planka_task_list(card_id, checklist_data, token, position=65536):
 
 # Function: create a task in a checklist in Planka
 def create_planka_task(task_list_id, item_data, token, position=65536):
-    url = f"{PLANKA_URL}/task-lists/{task_list_id}/tasks"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    path = f"task-lists/{task_list_id}/tasks"
 
     name = item_data.get("name", "Unnamed Task")[:1024]
 
@@ -385,28 +1231,43 @@ def create_planka_task(task_list_id, item_data, token, position=65536):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = planka_request("POST", path, json=payload)
         response.raise_for_status()
-        log_message(f"Task '{name}' added to checklist")
+        log_message(f"Task '{name}' added to checklist", detail=True)
         return response.json()["item"]
     except requests.RequestException as e:
         log_message(f"Error creating task '{name}': {e}")
         log_message(f"Server response: {response.text}")
         return None
 
+# Function: update the name and completion of an existing Planka task (used by the sync mode)
+def update_planka_task(task_id, item_data, token):
+    name = item_data.get("name", "Unnamed Task")[:1024]
+    payload = {
+        "name": name,
+        "isCompleted": item_data.get("state") == "complete",
+    }
+
+    try:
+        response = planka_request("PATCH", f"tasks/{task_id}", json=payload)
+        response.raise_for_status()
+        log_message(f"Task '{name}' updated", detail=True)
+        return response.json()["item"]
+    except requests.RequestException as e:
+        log_message(f"Error updating task '{name}': {e}")
+        return None
+
 # Function: create a label in Planka (if it does not exist)
 def create_label(token, board_id, name, color, position):
-    url = f"{PLANKA_URL}/boards/{board_id}/labels"
-    headers = {"Authorization": f"Bearer {token}"}
     data = {
         "name": name if name else None,
         "color": color,
         "position": position
     }
-    response = requests.post(url, headers=headers, json=data, verify=False)
+    response = planka_request("POST", f"boards/{board_id}/labels", json=data)
     if response.ok:
         item = response.json().get("item")
-        log_message(f"Label '{name}' ({color}) created")
+        log_message(f"Label '{name}' ({color}) created", detail=True)
         return item
     else:
         log_message(f"Error creating label '{name}' ({color}): {response.status_code}")
@@ -415,12 +1276,10 @@ def create_label(token, board_id, name, color, position):
 
 # Function: bind an existing label to a card in Planka
 def add_label_to_card(token, card_id, label_id, name, color):
-    url = f"{PLANKA_URL}/cards/{card_id}/card-labels"
-    headers = {"Authorization": f"Bearer {token}"}
     data = {"labelId": label_id}
-    response = requests.post(url, headers=headers, json=data, verify=False)
+    response = planka_request("POST", f"cards/{card_id}/card-labels", json=data)
     if response.ok:
-        log_message(f"Label '{name}' ({color}) added to the card")
+        log_message(f"Label '{name}' ({color}) added to the card", detail=True)
         return True
     else:
         log_message(f"Error binding label {label_id} to the card")
@@ -428,12 +1287,8 @@ def add_label_to_card(token, card_id, label_id, name, color):
     return False
 
 # Function: creating card attachments in Planka
-def add_attachment(token, card_id, file_path, original_date):
-    url = f"{PLANKA_URL}/cards/{card_id}/attachments"
-    headers = {
-        "Authorization": f"Bearer {token}",
-    }
-    filename = os.path.basename(file_path)
+def add_attachment(token, card_id, file_path, original_date, filename=None):
+    filename = filename or os.path.basename(file_path)
     with open(file_path, "rb") as file:
         files = {
             "file": (filename, file, "application/octet-stream")
@@ -443,15 +1298,77 @@ def add_attachment(token, card_id, file_path, original_date):
             "name": filename
         }
         try:
-            response = requests.post(url, headers=headers, data=data, files=files, verify=False)
+            # Multipart upload: let requests build the Content-Type with its boundary
+            response = planka_request("POST", f"cards/{card_id}/attachments", data=data, files=files,
+                                      headers={"Content-Type": None})
             response.raise_for_status()
             attachment = response.json()["item"]
-            log_message(f"Attachment '{filename}' added to the card")
+            log_message(f"Attachment '{filename}' added to the card", detail=True)
             return attachment
         except requests.RequestException as e:
             log_message(f"Error adding attachment '{filename}' to card {card_id}: {e}")
             return None
 
+# Multipart body streamed chunk by chunk; a known length avoids chunked transfer encoding
+class MultipartStream:
+    def __init__(self, head, chunks, tail, length=None):
+        self.head = head
+        self.chunks = chunks
+        self.tail = tail
+        self.length = length
+
+    def __iter__(self):
+        yield self.head
+        for chunk in self.chunks:
+            if chunk:
+                yield chunk
+        yield self.tail
+
+    def __len__(self):
+        return self.length
+
+# Function: upload an attachment to Planka straight from the Trello download response, with bounded memory
+def stream_attachment(token, card_id, source, filename, archive_path=None, digest=None):
+    boundary = uuid.uuid4().hex
+    head = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="type"\r\n\r\nfile\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="name"\r\n\r\n{filename}\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    def chunks():
+        archive = open(archive_path, "wb") if archive_path else None
+        try:
+            for chunk in source.iter_content(chunk_size=ATTACHMENT_CHUNK_SIZE):
+                if archive:
+                    archive.write(chunk)
+                if digest:
+                    digest.update(chunk)
+                yield chunk
+        finally:
+            if archive:
+                archive.close()
+
+    body = MultipartStream(head, chunks(), tail)
+    source_length = source.headers.get("Content-Length")
+    if source_length and "Content-Encoding" not in source.headers:
+        body.length = len(head) + int(source_length) + len(tail)
+    else:
+        body = iter(body)  # Unknown size: sent with chunked transfer encoding
+
+    try:
+        response = planka_request("POST", f"cards/{card_id}/attachments", data=body, retry=False,
+                                  headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        response.raise_for_status()
+        attachment = response.json()["item"]
+        log_message(f"Attachment '{filename}' added to the card", detail=True)
+        return attachment
+    except requests.RequestException as e:
+        log_message(f"Error adding attachment '{filename}' to card {card_id}: {e}")
+        return None
+
 
 # Function: converts the file name to Latin if it contains non-Latin characters (file name transliteration)
 def transliterate_filename(filename):
@@ -462,21 +1379,18 @@ def transliterate_filename(filename):
 
 # Function: update or remove a card cover in Planka (if a cover was found in the original Trello card)
 def update_card_cover(token, card_id, cover_attachment_id):
-    url = f"{PLANKA_URL}/cards/{card_id}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "coverAttachmentId": cover_attachment_id if cover_attachment_id else None
     }
 
     try:
-        response = requests.patch(url, json=payload, headers=headers, verify=False)
+        response = planka_request("PATCH", f"cards/{card_id}", json=payload)
         response.raise_for_status()
-        log_message(f"A cover was found and set for the card")
+        log_message(f"A cover was found and set for the card", detail=True)
+        return True
     except requests.RequestException as e:
         log_message(f"Error setting cover for card {card_id}: {e}")
+        return False
 
 # Matching tags in Trello with tags in Planka
 TRELLO_TO_PLANKA_COLORS = {
@@ -497,193 +1411,1704 @@ def get_planka_label_color(trello_color):
     return TRELLO_TO_PLANKA_COLORS.get(trello_color, "desert-sand")  # fallback
 
 
+# Migration journal: Trello id → Planka id mappings and finished steps, kept in SQLite so a rerun can resume
+class MigrationJournal:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS mapping (kind TEXT, trello_id TEXT, planka_id TEXT, PRIMARY KEY (kind, trello_id))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS step (kind TEXT, trello_id TEXT, step TEXT, PRIMARY KEY (kind, trello_id, step))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS fingerprint (kind TEXT, trello_id TEXT, value TEXT, PRIMARY KEY (kind, trello_id))")
+
+    def query(self, sql, args=()):
+        with self.lock:
+            return self.connection.execute(sql, args).fetchone()
+
+    def execute(self, sql, args=()):
+        with self.lock:
+            self.connection.execute(sql, args)
+
+    def get(self, kind, trello_id):
+        row = self.query("SELECT planka_id FROM mapping WHERE kind = ? AND trello_id = ?", (kind, trello_id))
+        return row[0] if row else None
+
+    def put(self, kind, trello_id, planka_id):
+        self.execute("INSERT OR REPLACE INTO mapping VALUES (?, ?, ?)", (kind, trello_id, str(planka_id)))
+
+    def is_done(self, kind, trello_id, step):
+        return self.query("SELECT 1 FROM step WHERE kind = ? AND trello_id = ? AND step = ?", (kind, trello_id, step)) is not None
+
+    def mark_done(self, kind, trello_id, step):
+        self.execute("INSERT OR IGNORE INTO step VALUES (?, ?, ?)", (kind, trello_id, step))
+
+    def get_fingerprint(self, kind, trello_id):
+        row = self.query("SELECT value FROM fingerprint WHERE kind = ? AND trello_id = ?", (kind, trello_id))
+        return row[0] if row else None
+
+    def set_fingerprint(self, kind, trello_id, value):
+        self.execute("INSERT OR REPLACE INTO fingerprint VALUES (?, ?, ?)", (kind, trello_id, value))
+
+    def get_meta(self, key):
+        row = self.query("SELECT value FROM meta WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def reset(self):
+        with self.lock:
+            for table in ("mapping", "step", "meta", "fingerprint"):
+                self.connection.execute(f"DELETE FROM {table}")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+journal = None
+
+# Function: open the journal; it is started over when resuming is off or it belongs to another Planka server.
+# Returns True if a previous run is continued
+def open_journal():
+    global journal
+    journal = MigrationJournal(JOURNAL_FILE)
+    resumed = False
+    if not RESUME and not SYNC_MODE:
+        journal.reset()
+    elif journal.get_meta("planka_url") not in (None, PLANKA_URL):
+        log_message(f"Journal belongs to {journal.get_meta('planka_url')}, starting from scratch")
+        journal.reset()
+    elif journal.get_meta("planka_url"):
+        log_message("Resuming the previous migration from the journal")
+        resumed = True
+    journal.set_meta("planka_url", PLANKA_URL)
+    return resumed
+
+def close_journal():
+    global journal
+    if journal is not None:
+        journal.close()
+    journal = None
+
+# Functions: journal helpers, no-ops when no journal is open
+def journal_get(kind, trello_id):
+    return journal.get(kind, trello_id) if journal is not None else None
+
+def journal_put(kind, trello_id, planka_id):
+    if journal is not None:
+        journal.put(kind, trello_id, planka_id)
+
+def journal_done(kind, trello_id, step):
+    return journal is not None and journal.is_done(kind, trello_id, step)
+
+def journal_mark(kind, trello_id, step):
+    if journal is not None:
+        journal.mark_done(kind, trello_id, step)
+
+# Function: remember the migrated state of an entity; returns True if it differs from the recorded one
+def journal_fingerprint_changed(kind, trello_id, value):
+    if journal is None:
+        return True
+    value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    if journal.get_fingerprint(kind, trello_id) == value:
+        return False
+    journal.set_fingerprint(kind, trello_id, value)
+    return True
+
+def journal_get_meta(key):
+    return journal.get_meta(key) if journal is not None else None
+
+def journal_set_meta(key, value):
+    if journal is not None:
+        journal.set_meta(key, value)
+
+
+
+# Offline snapshot: the export writes the Trello side to disk, the import replays it into Planka without contacting Trello
+# snapshot.jsonl holds one record per line, each board followed by its lists, labels, cards, checklists and comments.
+# index.json (workspaces, boards and the file offset of every board) is written last and marks a complete export.
+class SnapshotWriter:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, "attachments"), exist_ok=True)
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        self.file = open(os.path.join(path, "snapshot.jsonl"), "wb")
+        self.index = {
+            "exported_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "workspaces": [],
+            "boards": {},
+            "offsets": {},
+        }
+        self.counts = collections.Counter()
+
+    def write(self, record_type, data, **parents):
+        record = {"type": record_type, **parents, "data": data}
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        self.counts[record_type] += 1
+        if record_type == "workspace":
+            self.index["workspaces"].append(data)
+        elif record_type == "board":
+            self.index["boards"].setdefault(parents["workspace"], []).append(data)
+            self.index["offsets"][data["id"]] = self.file.tell()
+
+    def finish(self):
+        self.file.flush()
+        with open(os.path.join(self.path, "index.json"), "w", encoding="utf-8") as index_file:
+            json.dump(self.index, index_file, ensure_ascii=False)
+
+    def close(self):
+        self.file.close()
+
+class SnapshotReader:
+    RECORD_KEYS = {"list": "lists", "label": "labels", "card": "cards", "checklist": "checklists"}
+
+    def __init__(self, path):
+        index_path = os.path.join(path, "index.json")
+        if not os.path.exists(index_path):
+            raise RuntimeError(f"No complete snapshot in {path}, run the export first")
+        with open(index_path, encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        self.path = path
+        self.exported_at = index["exported_at"]
+        self.workspaces = index["workspaces"]
+        self.boards = index["boards"]
+        self.offsets = index["offsets"]
+        self.file = open(os.path.join(path, "snapshot.jsonl"), "rb")
+
+    def get_boards(self, workspace_id):
+        return self.boards.get(workspace_id, [])
+
+    # Reads only the records of one board, in the same shape get_board_snapshot returns
+    def get_board_snapshot(self, board_id):
+        board = {key: [] for key in self.RECORD_KEYS.values()}
+        comments = []
+        self.file.seek(self.offsets[board_id])
+        for line in self.file:
+            record = json.loads(line)
+            if record["type"] in ("workspace", "board"):
+                break
+            if record["type"] == "comment":
+                comments.append(record["data"])
+            else:
+                board[self.RECORD_KEYS[record["type"]]].append(record["data"])
+        return index_board_snapshot(board, comments)
 
-# Migration functions
+    def close(self):
+        self.file.close()
 
-# Function: migrate labels from Trello to Planka while preserving their order
-label_cache = {}  # Global cache to avoid creating duplicate labels
-def migrate_card_labels(token, board_id, card_id_planka, card_trello):
-    global label_cache
+snapshot_reader = None  # Set while a snapshot is being imported
 
-    labels = card_trello.get("labels", [])
-    if not labels:
-        return
+# Function: where an attachment is kept inside a snapshot (one folder per attachment, files keep their upload name)
+def snapshot_attachment_path(snapshot_dir, attachment):
+    _, file_name_translit = attachment_file_name(attachment)
+    return os.path.join(snapshot_dir, "attachments", attachment["id"], file_name_translit)
 
-    log_message(f"Migrating labels for card '{card_trello['name']}'")
 
-    for idx, label in enumerate(labels):
-        trello_color = label.get("color", "gray")
-        label_name = label.get("name", "").strip()
-        planka_color = get_planka_label_color(trello_color)
-        position = (idx + 1) * 65536
 
-        label_key = f"{board_id}_{label_name}_{planka_color}"
-        if label_key in label_cache:
-            label_id = label_cache[label_key]
-        else:
-            new_label = create_label(token, board_id, label_name, planka_color, position)
+# Migration functions
+
+# Function: create all labels of a board in Planka before its cards, in the Trello order; returns Trello label id → Planka label id
+def migrate_board_labels(token, board_id, trello_labels):
+    board_labels = {}
+    for idx, label in enumerate(trello_labels):
+        label_id = journal_get("label", label["id"])
+        if not label_id:
+            label_name = (label.get("name") or "").strip()
+            planka_color = get_planka_label_color(label.get("color"))
+            new_label = create_label(token, board_id, label_name, planka_color, (idx + 1) * 65536)
             if not new_label:
                 log_message(f"Failed to create label '{label_name}' ({planka_color})")
                 continue
             label_id = new_label["id"]
-            label_cache[label_key] = label_id
-
-        add_label_to_card(token, card_id_planka, label_id, label_name, planka_color)
+            journal_put("label", label["id"], label_id)
+        board_labels[label["id"]] = label_id
+    return board_labels
 
-# Function: transfers attachments from Trello to Planka, preserving the cover if applicable
-def migrate_attachments(token, card_id_planka, card_id_trello):
-    attachments = get_card_attachments(card_id_trello, APIKEY, APITOKEN)
-    cover_attachment_id = get_card_cover_attachment_id(card_id_trello)
+# Function: bind the labels of a Trello card to the Planka card, using the labels created for its board;
+# returns False if a label could not be bound
+def migrate_card_labels(token, board_labels, card_id_planka, card_trello):
+    labels = card_trello.get("labels", [])
+    if not labels:
+        return True
 
-    planka_attachments = {}
+    log_message(f"Migrating labels for card '{card_trello['name']}'", detail=True)
 
-    for attachment in attachments:
-        attachment_id = attachment["id"]
-
-        raw_file_name = attachment.get("name") or urllib.parse.unquote(attachment.get("fileName", "attachment"))
-        MAX_FILENAME_LENGTH = 200
-        if len(raw_file_name) > MAX_FILENAME_LENGTH:
-            raw_file_name = raw_file_name[:MAX_FILENAME_LENGTH] + "..."
-        file_name_translit = transliterate_filename(raw_file_name)
-        # Remove invalid filename characters for Windows
-        invalid_chars = r'<>:"/\|?*'
-        for ch in invalid_chars:
-            file_name_translit = file_name_translit.replace(ch, "_")
-
-        file_path = os.path.join(tempfile.gettempdir(), file_name_translit)
-        if len(file_path) > 255:
-            log_message(f"Skipped file '{raw_file_name}' — path length too long")
+    complete = True
+    for label in labels:
+        if journal_done("card", card_trello["id"], f"label:{label['id']}"):
             continue
-
-        download_url = f"https://api.trello.com/1/cards/{card_id_trello}/attachments/{attachment_id}/download/{urllib.parse.quote(raw_file_name)}"
-        headers = {"Authorization": f'OAuth oauth_consumer_key="{APIKEY}", oauth_token="{APITOKEN}"'}
-
-        try:
-            with requests.get(download_url, headers=headers, stream=True) as r:
-                r.raise_for_status()
-                with open(file_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-                shutil.copy(file_path, f"./output/attachments/{attachment_id}_download_{urllib.parse.quote(raw_file_name)}")
-
-        except requests.exceptions.RequestException:
-            log_message(f"Failed to download file '{raw_file_name}'")
+        label_name = (label.get("name") or "").strip()
+        planka_color = get_planka_label_color(label.get("color"))
+        label_id = board_labels.get(label["id"])
+        if not label_id:
+            log_message(f"Label '{label_name}' ({planka_color}) was not created for the board, skipped")
+            complete = False
             continue
+        if add_label_to_card(token, card_id_planka, label_id, label_name, planka_color):
+            journal_mark("card", card_trello["id"], f"label:{label['id']}")
+        else:
+            complete = False
+    return complete
+
+# Limits the total size of attachments in flight so memory and temp disk usage stay bounded
+class ByteBudget:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    # A file larger than the whole budget is still transferred, but only on its own
+    def acquire(self, amount):
+        amount = min(amount, self.limit)
+        with self.condition:
+            while self.in_flight and self.in_flight + amount > self.limit:
+                self.condition.wait()
+            self.in_flight += amount
+        return amount
+
+    def release(self, amount):
+        with self.condition:
+            self.in_flight -= amount
+            self.condition.notify_all()
+
+# Aggregate attachment throughput: bytes moved and the time span of the transfer stage
+class TransferMeter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.files = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, size, started, finished, files=1):
+        with self.lock:
+            self.total_bytes += size
+            self.files += files
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = finished if self.finished is None else max(self.finished, finished)
+
+    def rate(self):
+        with self.lock:
+            if not self.started or self.finished <= self.started:
+                return 0.0
+            return self.total_bytes / (self.finished - self.started) / 1048576
+
+# Content-addressed store of downloaded attachments: each file is kept once under its SHA-256, and an index maps
+# attachment ids (and, optionally, file name plus size) to it, so a file is downloaded from Trello once for all the cards
+# it is attached to and for later runs. Shared by board processes through its SQLite index.
+class AttachmentCache:
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pinned = collections.Counter()  # Files being uploaded, never evicted
+        self.downloading = {}  # Key → Event, so parallel cards wait for one download of the same file
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "index.sqlite3"), timeout=60, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+
+    def blob_path(self, digest):
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    @staticmethod
+    def keys(attachment):
+        keys = [f"id:{attachment['id']}"]
+        if ATTACHMENT_CACHE_BY_NAME and attachment.get("bytes"):
+            keys.append(f"name:{attachment_file_name(attachment)[0]}:{attachment['bytes']}")
+        return keys
+
+    # Cached path of the attachment (pinned until release), or None; a hit becomes the most recently used file
+    def get(self, attachment):
+        keys = self.keys(attachment)
+        with self.lock:
+            for key in keys:
+                row = self.db.execute("SELECT digest FROM keys WHERE key = ?", (key,)).fetchone()
+                if row and os.path.exists(self.blob_path(row[0])):
+                    self.db.execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), row[0]))
+                    self.db.executemany("INSERT OR REPLACE INTO keys VALUES (?, ?)", [(other, row[0]) for other in keys])
+                    self.pinned[row[0]] += 1
+                    return self.blob_path(row[0])
+        return None
 
-        try:
-            planka_attachment = add_attachment(token, card_id_planka, file_path, None)
-            if planka_attachment is not None:
-                planka_attachments[attachment_id] = planka_attachment["id"]
+    # Move a downloaded file into the store under its SHA-256 (hashed while it was downloaded); returns the cached path,
+    # pinned until release
+    def put(self, attachment, file_path, digest):
+        target = self.blob_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with self.lock:
+            if os.path.exists(target):
+                os.remove(file_path)  # Same content under another name: kept once
             else:
-                log_message(f"Failed to upload attachment '{raw_file_name}' to card")
+                os.replace(file_path, target)
+            self.db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (digest, os.path.getsize(target), time.time()))
+            self.db.executemany("INSERT OR REPLACE INTO keys VALUES (?, ?)", [(key, digest) for key in self.keys(attachment)])
+            self.pinned[digest] += 1
+            self.evict()
+        return target
+
+    def release(self, file_path):
+        with self.lock:
+            digest = os.path.basename(file_path)
+            self.pinned[digest] -= 1
+            if self.pinned[digest] <= 0:
+                del self.pinned[digest]
+
+    # Remove the least recently used files until the store fits max_bytes (called with the lock held)
+    def evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, size in self.db.execute("SELECT digest, size FROM blobs ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            if digest in self.pinned:
+                continue
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # Still open elsewhere (Windows): tried again on the next eviction
+            self.db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self.db.execute("DELETE FROM keys WHERE digest = ?", (digest,))
+            total -= size
+            count_stat("attachment_cache_evicted")
+
+    # Cached path of the attachment, downloaded with download(path, digest) on a miss, which feeds every chunk written to
+    # the hash object digest; None if the download failed. The caller releases the path once the file was used
+    def fetch(self, attachment, download):
+        key = self.keys(attachment)[-1]
+        while True:
+            file_path = self.get(attachment)
+            if file_path:
+                count_stat("attachment_cache_hits")
+                return file_path
+            with self.lock:
+                done = self.downloading.get(key)
+                if done is None:
+                    done = self.downloading[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                done.wait()  # If that download failed, this attachment is downloaded on the next pass
                 continue
-        except requests.exceptions.RequestException:
+            part_path = os.path.join(self.path, f"{uuid.uuid4().hex}.part")
+            digest = hashlib.sha256()
+            try:
+                if not download(part_path, digest):
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    return None
+                count_stat("attachment_cache_misses")
+                return self.put(attachment, part_path, digest.hexdigest())
+            finally:
+                with self.lock:
+                    del self.downloading[key]
+                done.set()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+attachment_cache = None
+
+def open_attachment_cache():
+    global attachment_cache
+    if ATTACHMENT_CACHE_MB and snapshot_reader is None and attachment_cache is None:
+        attachment_cache = AttachmentCache(ATTACHMENT_CACHE_DIR, ATTACHMENT_CACHE_MB * 1048576)
+
+def close_attachment_cache():
+    global attachment_cache
+    if attachment_cache is not None:
+        attachment_cache.close()
+        attachment_cache = None
+
+attachment_executor = None
+attachment_budget = None
+attachment_meter = TransferMeter()
+
+# Function: transfer one attachment within the in-flight byte budget and report its throughput
+def run_attachment_transfer(token, card_id_planka, card_id_trello, attachment):
+    size = attachment.get("bytes") or 0
+    reserved = attachment_budget.acquire(size) if attachment_budget else 0
+    try:
+        started = time.monotonic()
+        planka_attachment = transfer_attachment(token, card_id_planka, card_id_trello, attachment)
+        finished = time.monotonic()
+    finally:
+        if attachment_budget:
+            attachment_budget.release(reserved)
+
+    if planka_attachment is not None:
+        attachment_meter.record(size, started, finished)
+        elapsed = max(finished - started, 0.001)
+        log_message(f"Attachment '{attachment.get('name')}' transferred: {size / 1048576:.2f} MB in {elapsed:.2f} s "
+                    f"({size / 1048576 / elapsed:.2f} MB/s, overall {attachment_meter.rate():.2f} MB/s)", detail=True)
+    return planka_attachment
+
+# Function: build a safe file name for an attachment (transliterated, without characters invalid on Windows)
+def attachment_file_name(attachment):
+    raw_file_name = attachment.get("name") or urllib.parse.unquote(attachment.get("fileName", "attachment"))
+    MAX_FILENAME_LENGTH = 200
+    if len(raw_file_name) > MAX_FILENAME_LENGTH:
+        raw_file_name = raw_file_name[:MAX_FILENAME_LENGTH] + "..."
+    file_name_translit = transliterate_filename(raw_file_name)
+    # Remove invalid filename characters for Windows
+    invalid_chars = r'<>:"/\|?*'
+    for ch in invalid_chars:
+        file_name_translit = file_name_translit.replace(ch, "_")
+    return raw_file_name, file_name_translit
+
+# Function: path of the local archive copy of an attachment (None if copies are disabled)
+def attachment_archive_path(attachment_id, raw_file_name):
+    if not SAVE_ATTACHMENT_COPY:
+        return None
+    return os.path.join(BASE_DIR, "output", "attachments", f"{attachment_id}_download_{urllib.parse.quote(raw_file_name)}")
+
+# Function: URL of the Trello download of an attachment, relative to TRELLO_URL
+def attachment_download_url(card_id_trello, attachment):
+    raw_file_name, _ = attachment_file_name(attachment)
+    return f"cards/{card_id_trello}/attachments/{attachment['id']}/download/{urllib.parse.quote(raw_file_name)}"
+
+# Function: download a Trello attachment into a local file (feeding the hash object digest if given), returns False if the
+# download failed
+def download_attachment(card_id_trello, attachment, file_path, digest=None):
+    try:
+        with trello_request("GET", attachment_download_url(card_id_trello, attachment), stream=True) as r:
+            r.raise_for_status()
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=ATTACHMENT_CHUNK_SIZE):
+                    f.write(chunk)
+                    if digest:
+                        digest.update(chunk)
+    except requests.exceptions.RequestException:
+        log_message(f"Failed to download file '{attachment_file_name(attachment)[0]}'")
+        return False
+    return True
+
+# Function: upload a local file to a Planka card (as file_name if given), returns the Planka attachment or None
+def upload_attachment(token, card_id_planka, file_path, raw_file_name, file_name=None):
+    try:
+        planka_attachment = add_attachment(token, card_id_planka, file_path, None, file_name)
+        if planka_attachment is None:
             log_message(f"Failed to upload attachment '{raw_file_name}' to card")
-            continue
+        return planka_attachment
+    except requests.exceptions.RequestException:
+        log_message(f"Failed to upload attachment '{raw_file_name}' to card")
+        return None
 
-        os.remove(file_path)
+# Function: pipe one attachment from the Trello download into the Planka upload (copying it to file_path and feeding the
+# hash object digest if given), returns the Planka attachment or None
+def stream_from_trello(token, card_id_planka, card_id_trello, attachment, file_path=None, digest=None):
+    raw_file_name, file_name_translit = attachment_file_name(attachment)
+    try:
+        with trello_request("GET", attachment_download_url(card_id_trello, attachment), stream=True) as r:
+            r.raise_for_status()
+            planka_attachment = stream_attachment(token, card_id_planka, r, file_name_translit, file_path, digest)
+    except requests.exceptions.RequestException:
+        log_message(f"Failed to download file '{raw_file_name}'")
+        return None
+    if planka_attachment is None:
+        log_message(f"Failed to upload attachment '{raw_file_name}' to card")
+    return planka_attachment
+
+# Function: transfer one attachment through the attachment cache: a cached file is uploaded from disk, a missing one is
+# downloaded into the cache first (or, when streaming, copied into it while it is piped to Planka)
+def transfer_cached_attachment(token, card_id_planka, card_id_trello, attachment, archive_path):
+    raw_file_name, file_name_translit = attachment_file_name(attachment)
+    streamed = []
+
+    def download(file_path, digest):
+        if not STREAM_ATTACHMENTS:
+            return download_attachment(card_id_trello, attachment, file_path, digest)
+        streamed.append(stream_from_trello(token, card_id_planka, card_id_trello, attachment, file_path, digest))
+        return streamed[0] is not None
+
+    # Files in use are only pinned within a process, so another board process may evict one right after it was found;
+    # it is then downloaded again
+    for _ in range(2):
+        file_path = attachment_cache.fetch(attachment, download)
+        if file_path is None:
+            return None
+        try:
+            if archive_path and not os.path.exists(archive_path):
+                try:
+                    os.link(file_path, archive_path)  # The archive copy shares the cached file's disk space
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    shutil.copy(file_path, archive_path)
+            if streamed:
+                return streamed[0]
+            return upload_attachment(token, card_id_planka, file_path, raw_file_name, file_name_translit)
+        except FileNotFoundError:
+            if streamed:
+                return streamed[0]  # Already uploaded while it was downloaded, only the local copy is missing
+            log_message(f"Cached file of attachment '{raw_file_name}' was evicted by another process, downloading it again")
+        finally:
+            attachment_cache.release(file_path)
+    return None
 
-    cover_planka_id = planka_attachments.get(cover_attachment_id)
-    if cover_planka_id:
-        update_card_cover(token, card_id_planka, cover_planka_id)
-    else:
-        log_message(f"Cover not set: no corresponding attachment found")
+# Function: transfer one attachment from a Trello card to a Planka card, returns the Planka attachment or None
+def transfer_attachment(token, card_id_planka, card_id_trello, attachment):
+    attachment_id = attachment["id"]
+    raw_file_name, file_name_translit = attachment_file_name(attachment)
+    archive_path = attachment_archive_path(attachment_id, raw_file_name)
+
+    # Importing a snapshot: the file was downloaded by the export
+    if snapshot_reader is not None:
+        file_path = snapshot_attachment_path(snapshot_reader.path, attachment)
+        if not os.path.exists(file_path):
+            log_message(f"Skipped file '{raw_file_name}' — not in the snapshot")
+            return None
+        return upload_attachment(token, card_id_planka, file_path, raw_file_name)
 
-    return planka_attachments
+    if attachment_cache is not None:
+        return transfer_cached_attachment(token, card_id_planka, card_id_trello, attachment, archive_path)
 
-# Function: Main migration from Trello to Planka
-def migrate_workspaces():
-    open(LOG_FILE, "w", encoding="utf-8").close()
-    log_message("Starting migration Trello → Planka")
+    if STREAM_ATTACHMENTS:
+        return stream_from_trello(token, card_id_planka, card_id_trello, attachment, archive_path)
 
-    trello_workspaces = get_workspaces()
-    log_message(f"Retrieved workspaces: {len(trello_workspaces)}")
+    # Each attachment gets its own temp folder: cards migrated in parallel may share file names
+    temp_dir = os.path.join(tempfile.gettempdir(), f"trello_{attachment_id}")
+    file_path = os.path.join(temp_dir, file_name_translit)
+    if len(file_path) > 255:
+        log_message(f"Skipped file '{raw_file_name}' — path length too long")
+        return None
 
-    token = get_token()
-    if token:
-        log_message("Bearer token successfully obtained")
+    try:
+        if not download_attachment(card_id_trello, attachment, file_path):
+            return None
+        if archive_path:
+            shutil.copy(file_path, archive_path)
+        return upload_attachment(token, card_id_planka, file_path, raw_file_name)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+# Function: transfers attachments from Trello to Planka, preserving the cover if applicable. Returns the Planka ids by
+# Trello attachment id, False if an upload or the cover failed, and the number of attachments left out by MAX_ATTACHMENT_MB
+def migrate_attachments(token, card_id_planka, card_trello, attachments=None):
+    card_id_trello = card_trello["id"]
+    cover_attachment_id = card_trello.get("idAttachmentCover")
+
+    if attachments is None:
+        if card_trello.get("badges", {}).get("attachments") == 0:
+            count_stat("requests_saved_attachments")
+            return {}, True, 0
+        attachments = get_card_attachments(card_id_trello)
+    in_scope_attachments = attachments_in_scope(attachments)
+    left_out = len(attachments) - len(in_scope_attachments)
+    attachments = in_scope_attachments
+    complete = True
+    if not attachments:
+        return {}, complete, left_out
+
+    planka_attachments = {}
+    cover_set = journal_done("card", card_id_trello, "cover")
+
+    # Attachments uploaded by a previous run are taken from the journal
+    pending = []
+    for attachment in attachments:
+        planka_attachment_id = journal_get("attachment", attachment["id"])
+        if planka_attachment_id:
+            planka_attachments[attachment["id"]] = planka_attachment_id
+        else:
+            pending.append(attachment)
+
+    if attachment_executor is not None:
+        jobs = {
+            attachment_executor.submit(run_attachment_transfer, token, card_id_planka, card_id_trello, attachment): attachment["id"]
+            for attachment in pending
+        }
+        completed = ((jobs[job], job.result()) for job in concurrent.futures.as_completed(jobs))
     else:
-        log_message("Failed to obtain token")
-        return
+        completed = ((attachment["id"], run_attachment_transfer(token, card_id_planka, card_id_trello, attachment))
+                     for attachment in pending)
 
-    for ws in trello_workspaces:
-        log_message(f"\nMigrating workspace: {ws.get('displayName')}")
-        project = create_planka_project(ws, token)
-        if not project:
-            log_message(f"Failed to create project for workspace: {ws.get('displayName')}")
+    for attachment_id, planka_attachment in completed:
+        if planka_attachment is None:
+            complete = False
             continue
+        planka_attachments[attachment_id] = planka_attachment["id"]
+        journal_put("attachment", attachment_id, planka_attachment["id"])
+
+        # The cover is set as soon as its own upload is done, without waiting for the other files
+        if attachment_id == cover_attachment_id and not cover_set:
+            cover_set = update_card_cover(token, card_id_planka, planka_attachment["id"])
+            if cover_set:
+                journal_mark("card", card_id_trello, "cover")
+
+    if not cover_set and planka_attachments.get(cover_attachment_id):
+        cover_set = update_card_cover(token, card_id_planka, planka_attachments[cover_attachment_id])
+        if cover_set:
+            journal_mark("card", card_id_trello, "cover")
+    if not cover_set:
+        log_message(f"Cover not set: no corresponding attachment found", detail=True)
+        if any(attachment["id"] == cover_attachment_id for attachment in attachments):
+            complete = False
+
+    return planka_attachments, complete, left_out
+
+# Function: migrate one Trello card with its attachments, labels, checklists and comments; returns False if anything
+# failed (the card is then not marked complete and a rerun retries what is missing)
+def migrate_card(token, planka_board, planka_list, list_name, trello_card, position, snapshot=None, since=None, board_labels=None,
+                 prefetched=None):
+    planka_card_id = journal_get("card", trello_card["id"])
+    card_state = {key: trello_card.get(key) for key in ("name", "desc", "due", "idList", "closed", "pos")}
+
+    # Sync mode: a card migrated by a previous run is only revisited if it had activity since that run (or was not completed)
+    synced = since is not None and planka_card_id is not None
+    completed = card_complete(trello_card["id"])
+    if synced and trello_card.get("dateLastActivity", "") <= since and completed:
+        count_stat("cards_unchanged")
+        return True
+    if not synced and completed:
+        log_message(f"Card '{trello_card.get('name')}' already migrated, skipped", detail=True)
+        return True
 
-        boards = get_boards(ws["id"])
-        log_message(f"Boards found: {len(boards)}")
+    if planka_card_id:
+        planka_card = {"id": planka_card_id}
+        if synced:
+            count_stat("cards_changed")
+            if journal_fingerprint_changed("card", trello_card["id"], card_state):
+                update_planka_card(planka_card_id, planka_list["id"], trello_card, token, position)
+        else:
+            log_message(f"Resuming card '{trello_card.get('name')}'", detail=True)
+    else:
+        planka_card = create_planka_card(planka_list["id"], list_name, trello_card, token, position)
+        if not planka_card:
+            log_message(f"Skipped card: {trello_card.get('name')}")
+            return False
+        journal_put("card", trello_card["id"], planka_card["id"])
+        journal_fingerprint_changed("card", trello_card["id"], card_state)
+
+    # Only comments posted since the previous sync are fetched for known cards (all of them for a card not completed)
+    comments_since = since if synced and completed else None
+    fetched = prefetched.result() if prefetched is not None else None  # Read by the prefetch pool while earlier cards were written
+    if snapshot is not None:
+        attachments = snapshot["attachments"].get(trello_card["id"], [])
+        checklists = snapshot["checklists"].get(trello_card["id"], [])
+        if snapshot.get("since") and not comments_since:
+            comments = get_card_comments(trello_card["id"])  # New card (e.g. moved in from another board): full history
+        else:
+            comments = snapshot["comments"].get(trello_card["id"], [])
+    elif fetched is not None:
+        attachments, checklists, comments = fetched["attachments"], fetched["checklists"], fetched["comments"]
+    else:
+        attachments = None
+        checklists = get_card_checklists(trello_card["id"])
+        comments = get_card_comments(trello_card["id"], comments_since)
+    if snapshot is None:
+        # Read card by card, the cover id still comes with the listed card, no separate cards/{id} request is needed
+        count_stat("requests_saved_cover")
+
+    # Stays true only if nothing failed, so a resumed run retries what is missing
+    attachment_ids, complete, attachments_left_out = migrate_attachments(token, planka_card["id"], trello_card, attachments)
+    if not migrate_card_labels(token, board_labels or {}, planka_card["id"], trello_card):
+        complete = False
+
+    # With database access everything new is inserted at once; the API calls below then find it in the journal
+    # (or create all of it, if the insert failed)
+    if planka_db is not None and not planka_db.disabled:
+        insert_card_contents(planka_card["id"], checklists, comments, attachment_ids)
+
+    if checklists:
+        log_message(f"Checklists found in card '{trello_card.get('name')}': {len(checklists)}", detail=True)
+        for k, checklist in enumerate(checklists):
+            planka_task_list_id = journal_get("checklist", checklist["id"])
+            if not planka_task_list_id:
+                checklist_position = (k + 1) * 65536
+                planka_task_list = create_planka_task_list(planka_card["id"], checklist, token, checklist_position)
+                if not planka_task_list:
+                    log_message(f"Failed to create checklist: {checklist.get('name')}")
+                    complete = False
+                    continue
+                planka_task_list_id = planka_task_list["id"]
+                journal_put("checklist", checklist["id"], planka_task_list_id)
+
+            for m, item in enumerate(checklist.get("checkItems", [])):
+                item_state = {"name": item.get("name"), "state": item.get("state")}
+                planka_task_id = journal_get("task", item["id"])
+                if planka_task_id:
+                    if synced and journal_fingerprint_changed("task", item["id"], item_state):
+                        update_planka_task(planka_task_id, item, token)
+                    continue
+                task_position = (m + 1) * 65536
+                planka_task = create_planka_task(planka_task_list_id, item, token, task_position)
+                if planka_task:
+                    journal_put("task", item["id"], planka_task["id"])
+                    journal_fingerprint_changed("task", item["id"], item_state)
+                else:
+                    complete = False
+
+    for comment in reversed(comments):
+        data = comment.get("data", {})
+        text = data.get("text")
+        author = comment.get("memberCreator", {})
+        if text and not journal_get("comment", comment["id"]):
+            planka_comment = create_planka_comment(
+                planka_card["id"],
+                text,
+                token,
+                author_name=author.get("fullName"),
+                author_username=author.get("username"),
+                date=comment.get("date"),
+                attachment_ids=attachment_ids
+            )
+            if planka_comment:
+                journal_put("comment", comment["id"], planka_comment["id"])
+            else:
+                complete = False
+
+    if complete:
+        # Attachments left out by the size limit are not a failure, but a run with a higher limit revisits the card
+        journal_mark("card", trello_card["id"], card_scope_step() if attachments_left_out else "complete")
+    return complete
+
+# Function: insert the task lists, tasks and comments of a card that are not in the journal yet into the Planka database
+def insert_card_contents(card_id, checklists, comments, attachment_ids):
+    task_lists, tasks, new_comments, task_states = [], [], [], {}
+    for k, checklist in enumerate(checklists):
+        if not journal_get("checklist", checklist["id"]):
+            task_lists.append((checklist["id"], checklist.get("name", "Unnamed Checklist")[:128], (k + 1) * 65536))
+        for m, item in enumerate(checklist.get("checkItems", [])):
+            if not journal_get("task", item["id"]):
+                tasks.append((item["id"], checklist["id"], item.get("name", "Unnamed Task")[:1024], (m + 1) * 65536,
+                              item.get("state") == "complete"))
+                task_states[item["id"]] = {"name": item.get("name"), "state": item.get("state")}
+
+    for comment in reversed(comments):
+        text = comment.get("data", {}).get("text")
+        if text and not journal_get("comment", comment["id"]):
+            author = comment.get("memberCreator", {})
+            date = comment.get("date")
+            text = format_comment_text(text, author.get("fullName"), author.get("username"), date, attachment_ids)
+            created_at = datetime.datetime.fromisoformat(date.replace("Z", "")) if date else None
+            new_comments.append((comment["id"], text[:1048576], created_at))
+
+    if not (task_lists or tasks or new_comments):
+        return
+    task_list_ids = {checklist["id"]: journal_get("checklist", checklist["id"]) for checklist in checklists}
+    try:
+        inserted = planka_db.insert_card_contents(card_id, task_list_ids, task_lists, tasks, new_comments)
+    except psycopg2.Error as e:
+        planka_db.disabled = True
+        log_message(f"Writing to the Planka database failed, the API is used from now on: {e}")
+        return
 
-        for idx, board in enumerate(boards):
-            position = (idx + 1) * 65536
-            planka_board = create_planka_board(project["id"], ws["displayName"], board, token, position)
-            if not planka_board:
-                log_message(f"Skipped board: {board.get('name')}")
-                continue
+    for kind, rows in (("checklist", task_lists), ("task", tasks), ("comment", new_comments)):
+        for row in rows:
+            journal_put(kind, row[0], inserted[row[0]])
+    for item_id, item_state in task_states.items():
+        journal_fingerprint_changed("task", item_id, item_state)
+    log_message(f"Inserted into the database: {len(task_lists)} checklists, {len(tasks)} tasks, {len(new_comments)} comments", detail=True)
+
+# Function: read what migrate_card needs from Trello for a card (checklists, comments, attachment list), so it can be
+# fetched ahead while earlier cards are written to Planka; None for a card that migrate_card will skip
+def prefetch_card(trello_card, since=None):
+    synced = since is not None and journal_get("card", trello_card["id"]) is not None
+    completed = card_complete(trello_card["id"])
+    if synced and trello_card.get("dateLastActivity", "") <= since and completed:
+        return None
+    if not synced and completed:
+        return None
+    attachments = []
+    if trello_card.get("badges", {}).get("attachments") == 0:
+        count_stat("requests_saved_attachments")
+    else:
+        attachments = get_card_attachments(trello_card["id"])
+    return {
+        "checklists": get_card_checklists(trello_card["id"]),
+        "comments": get_card_comments(trello_card["id"], since if synced and completed else None),
+        "attachments": attachments,
+    }
 
-            trello_lists = get_lists(board["id"])
-            log_message(f"Lists found in board '{board.get('name')}': {len(trello_lists)}")
+# Function: migrate a card and count it in the progress, also when it fails
+def migrate_card_with_progress(*card_args):
+    try:
+        return migrate_card(*card_args)
+    finally:
+        progress.card_done(card_args[4]["id"])
+
+# Function: wait for the cards submitted to the worker pool; returns how many did not finish, re-raises the first error
+# in card order
+def wait_for_cards(card_jobs):
+    return sum(not job.result() for job in card_jobs)
+
+# Function: check a workspace, board or list against the include and exclude filters of the scope
+def in_scope(entity, include, exclude, keys=("id", "name")):
+    values = {str(entity.get(key) or "").strip().lower() for key in keys}
+    if include and not values & {str(value).strip().lower() for value in include}:
+        return False
+    return not values & {str(value).strip().lower() for value in exclude or ()}
+
+# Function: the card and attachment scope of this run as text, stored with a completed board ("" = nothing left out)
+def migration_scope():
+    scope = {
+        "include_lists": INCLUDE_LISTS, "exclude_lists": EXCLUDE_LISTS, "cards_active_since": CARDS_ACTIVE_SINCE,
+        "cards_active_until": CARDS_ACTIVE_UNTIL, "skip_archived_cards": SKIP_ARCHIVED_CARDS, "max_attachment_mb": MAX_ATTACHMENT_MB,
+    }
+    return json.dumps(scope, sort_keys=True) if any(scope.values()) else ""
+
+# Function: True if the board was completed with the scope of this run; a board completed with another scope (e.g. fewer
+# lists) is visited again, where its completed cards are skipped
+def board_complete(board_id):
+    return journal_done("board", board_id, "complete") and (journal_get_meta(f"scope:{board_id}") or "") == migration_scope()
+
+# Function: True if the card was completed, with all attachments or with those within the current MAX_ATTACHMENT_MB
+def card_complete(card_id):
+    return journal_done("card", card_id, "complete") or bool(MAX_ATTACHMENT_MB and journal_done("card", card_id, card_scope_step()))
+
+# The journal step of a card completed without the attachments over MAX_ATTACHMENT_MB; a higher limit revisits the card
+def card_scope_step():
+    return f"complete:max_attachment_mb={MAX_ATTACHMENT_MB}"
+
+# Function: a day as YYYY-MM-DD, the form card_in_scope compares with dateLastActivity; rejects anything else
+def iso_date(value):
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+# Function: check a card against the activity dates of the scope; archived cards also against the list filters
+def card_in_scope(card, list_ids=None):
+    last_activity = (card.get("dateLastActivity") or "")[:10]
+    if CARDS_ACTIVE_SINCE and last_activity < CARDS_ACTIVE_SINCE:
+        return False
+    if CARDS_ACTIVE_UNTIL and last_activity > CARDS_ACTIVE_UNTIL:
+        return False
+    return list_ids is None or not card.get("closed") or card.get("idList") in list_ids
+
+# Function: drop the attachments over MAX_ATTACHMENT_MB
+def attachments_in_scope(attachments, quiet=False):
+    if not MAX_ATTACHMENT_MB:
+        return attachments
+    limit = MAX_ATTACHMENT_MB * 1048576
+    kept = [attachment for attachment in attachments if (attachment.get("bytes") or 0) <= limit]
+    for attachment in attachments:
+        if (attachment.get("bytes") or 0) > limit and not quiet:
+            log_message(f"Skipped file '{attachment.get('name')}' — larger than {MAX_ATTACHMENT_MB} MB")
+            count_stat("attachments_skipped")
+    return kept
+
+# Function: migrate one Trello board with its lists and cards into a Planka project
+def migrate_board(token, project, project_name, board, position, executor=None):
+    # The next sync starts from the moment this pass began (with a margin for clock drift); for a snapshot, when it was exported
+    started = datetime.datetime.now(datetime.timezone.utc)
+    if snapshot_reader is not None:
+        started = datetime.datetime.strptime(snapshot_reader.exported_at, "%Y-%m-%dT%H:%M:%S.000Z").replace(tzinfo=datetime.timezone.utc)
+    sync_started = (started - SYNC_CLOCK_MARGIN).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    since = journal_get_meta(f"last_sync:{board['id']}") if SYNC_MODE else None
+    if since:
+        log_message(f"Syncing board '{board.get('name')}': changes since {since}")
+    elif board_complete(board["id"]):
+        log_message(f"Board '{board.get('name')}' already migrated, skipped")
+        return
 
-            archive_name = "ARCHIVED"
-            if any(l.get("name") == archive_name for l in trello_lists):
-                archive_name = f"ARCHIVED_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            trello_lists.append({"name": archive_name, "id": None, "card_type": "closed"})  # Placeholder for archived cards
+    planka_board_id = journal_get("board", board["id"])
+    if planka_board_id:
+        planka_board = {"id": planka_board_id}
+    else:
+        planka_board = create_planka_board(project["id"], project_name, board, token, position)
+        if not planka_board:
+            log_message(f"Skipped board: {board.get('name')}")
+            count_stat("boards_failed")
+            return
+        journal_put("board", board["id"], planka_board["id"])
+
+    snapshot = None
+    if snapshot_reader is not None:
+        snapshot = snapshot_reader.get_board_snapshot(board["id"])  # Holds every comment, so "since" stays unset
+        trello_lists = list(snapshot["lists"])
+    elif BULK_FETCH:
+        snapshot = get_board_snapshot(board["id"], since)
+        snapshot["since"] = since
+        trello_lists = list(snapshot["lists"])
+    else:
+        trello_lists = get_lists(board["id"])
+    log_message(f"Lists found in board '{board.get('name')}': {len(trello_lists)}")
+    trello_lists = [l for l in trello_lists if in_scope(l, INCLUDE_LISTS, EXCLUDE_LISTS)]
+    list_ids = {l["id"] for l in trello_lists} if INCLUDE_LISTS or EXCLUDE_LISTS else None
+
+    # Labels are created once per board up front, so cards migrated in parallel only bind them
+    trello_labels = snapshot["labels"] if snapshot is not None else get_board_labels(board["id"])
+    board_labels = migrate_board_labels(token, planka_board["id"], trello_labels)
+
+    archive_name = "ARCHIVED"
+    if any(l.get("name") == archive_name for l in trello_lists):
+        archive_name = f"ARCHIVED_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if not SKIP_ARCHIVED_CARDS:
+        trello_lists.append({"name": archive_name, "id": None, "card_type": "closed"})  # Placeholder for archived cards
+
+    # Trello reads and Planka writes overlap: the prefetch pool reads the next PREFETCH_CARDS cards while the cards
+    # before them are written (a board read in bulk or from a snapshot has everything already)
+    card_jobs = collections.deque()
+    prefetching = collections.deque()
+    failed = collections.Counter()  # Lists and cards that did not finish; the board is only complete without any
+    prefetcher = None
+    if snapshot is None and PREFETCH_CARDS:
+        prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+    def dispatch(card_args, prefetched=None):
+        if executor is not None:
+            card_jobs.append(executor.submit(migrate_card_with_progress, *card_args, prefetched))
+            # Only a few cards wait per worker, so the rest of a streamed list is not read (and held) ahead of them
+            while len(card_jobs) > CARD_WORKERS * CARD_QUEUE_SIZE:
+                failed["cards"] += not card_jobs.popleft().result()
+        else:
+            failed["cards"] += not migrate_card_with_progress(*card_args, prefetched)
 
-            for i, trello_list in enumerate(trello_lists):
+    try:
+        for i, trello_list in enumerate(trello_lists):
+            list_key = trello_list["id"] or f"{board['id']}:archived"
+            planka_list_id = journal_get("list", list_key)
+            if planka_list_id:
+                planka_list = {"id": planka_list_id}
+            else:
                 list_position = (i + 1) * 65536
                 planka_list = create_planka_list(planka_board["id"], board["name"], trello_list, token, list_position)
                 if not planka_list:
                     log_message(f"Skipped list: {trello_list.get('name')}")
+                    failed["lists"] += 1
                     continue
+                journal_put("list", list_key, planka_list["id"])
+            progress.advance("lists")
 
-                trello_cards = []
+            if snapshot is not None:
                 if trello_list["name"] != archive_name:
-                    trello_cards = get_cards(trello_list["id"])
+                    trello_cards = snapshot["cards"].get(trello_list["id"], [])
                 else:
-                    trello_cards = get_archived_cards(board["id"])
-                log_message(f"Cards found in list '{trello_list.get('name')}': {len(trello_cards)}")
-
-                for j, trello_card in enumerate(trello_cards):
-                    card_position = (j + 1) * 65536
-                    planka_card = create_planka_card(planka_list["id"], trello_list["name"], trello_card, token, card_position)
-                    if not planka_card:
-                        log_message(f"Skipped card: {trello_card.get('name')}")
-                        continue
-
-                    attachment_ids = migrate_attachments(token, planka_card["id"], trello_card["id"])
-                    migrate_card_labels(token, planka_board["id"], planka_card["id"], trello_card)
-
-                    checklists = get_card_checklists(trello_card["id"])
-                    if checklists:
-                        log_message(f"Checklists found in card '{trello_card.get('name')}': {len(checklists)}")
-                        for k, checklist in enumerate(checklists):
-                            checklist_position = (k + 1) * 65536
-                            planka_task_list = create_planka_task_list(planka_card["id"], checklist, token, checklist_position)
-                            if not planka_task_list:
-                                log_message(f"Failed to create checklist: {checklist.get('name')}")
-                                continue
-
-                            for m, item in enumerate(checklist.get("checkItems", [])):
-                                task_position = (m + 1) * 65536
-                                create_planka_task(planka_task_list["id"], item, token, task_position)
-
-                    comments = get_card_comments(trello_card["id"])
-                    for comment in reversed(comments):
-                        data = comment.get("data", {})
-                        text = data.get("text")
-                        author = comment.get("memberCreator", {})
-                        if text:
-                            create_planka_comment(
-                                planka_card["id"],
-                                text,
-                                token,
-                                author_name=author.get("fullName"),
-                                author_username=author.get("username"),
-                                date=comment.get("date"),
-                                attachment_ids=attachment_ids
-                            )
-
-    log_message("\nMigration completed")
\ No newline at end of file
+                    trello_cards = snapshot["archived_cards"]
+            elif trello_list["name"] != archive_name:
+                trello_cards = get_cards(trello_list["id"])
+            else:
+                trello_cards = iter_archived_cards(board["id"])  # Streamed: cards are handed to the workers page by page
+
+            found = 0
+            for trello_card in trello_cards:
+                if not card_in_scope(trello_card, list_ids):
+                    count_stat("cards_out_of_scope")
+                    continue
+                found += 1
+                card_position = found * 65536  # Positions follow the Trello order even when cards finish out of order
+                card_args = (token, planka_board, planka_list, trello_list["name"], trello_card, card_position, snapshot, since, board_labels)
+                if prefetcher is None:
+                    dispatch(card_args)
+                    continue
+                prefetching.append((card_args, prefetcher.submit(prefetch_card, trello_card, since)))
+                if len(prefetching) > PREFETCH_CARDS:
+                    dispatch(*prefetching.popleft())
+            log_message(f"Cards found in list '{trello_list.get('name')}': {found}")
+
+        while prefetching:
+            dispatch(*prefetching.popleft())
+        failed["cards"] += wait_for_cards(card_jobs)
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown(cancel_futures=True)
+
+    # A board with failures stays open (and keeps its sync window), so the next run retries what is missing. Otherwise the
+    # board is complete for this scope and the next sync starts from this pass; a wider scope visits the board again
+    if failed["lists"] or failed["cards"]:
+        log_message(f"Board '{board.get('name')}' not complete: {failed['lists']} lists and {failed['cards']} cards failed, "
+                    f"a rerun with resume retries them")
+        count_stat("boards_failed")
+    else:
+        journal_mark("board", board["id"], "complete")
+        journal_set_meta(f"scope:{board['id']}", migration_scope())
+        journal_set_meta(f"last_sync:{board['id']}", sync_started)
+
+# Function: write the run statistics to the log
+def log_run_summary():
+    saved_cover = run_stats["requests_saved_cover"]
+    saved_attachments = run_stats["requests_saved_attachments"]
+    log_message(f"Trello requests saved: {saved_cover + saved_attachments} "
+                f"(cover lookups: {saved_cover}, attachment lookups for cards without attachments: {saved_attachments})")
+    log_message(f"Retried requests: Trello {run_stats['retries_trello']}, Planka {run_stats['retries_planka']}")
+    log_message(f"Progress: {progress.status()}")
+    if SYNC_MODE:
+        log_message(f"Sync: {run_stats['cards_changed']} changed cards updated, {run_stats['cards_unchanged']} unchanged cards skipped")
+    if run_stats["cards_out_of_scope"]:
+        log_message(f"Cards left out by the scope: {run_stats['cards_out_of_scope']}")
+    if run_stats["attachments_skipped"]:
+        log_message(f"Attachments skipped (larger than {MAX_ATTACHMENT_MB} MB): {run_stats['attachments_skipped']}")
+    if run_stats["db_task_lists"] or run_stats["db_tasks"] or run_stats["db_comments"]:
+        log_message(f"Inserted into the Planka database: {run_stats['db_task_lists']} checklists, "
+                    f"{run_stats['db_tasks']} tasks, {run_stats['db_comments']} comments")
+    if run_stats["boards_failed"] or run_stats["projects_failed"]:
+        log_message(f"Not migrated completely: {run_stats['boards_failed']} boards, {run_stats['projects_failed']} projects "
+                    f"(a rerun with resume retries them)")
+    if attachment_meter.files:
+        log_message(f"Attachments transferred: {attachment_meter.files}, "
+                    f"{attachment_meter.total_bytes / 1048576:.2f} MB at {attachment_meter.rate():.2f} MB/s")
+    if run_stats["attachment_cache_hits"] or run_stats["attachment_cache_misses"]:
+        log_message(f"Attachment cache: {run_stats['attachment_cache_hits']} files reused, {run_stats['attachment_cache_misses']} downloaded, "
+                    f"{run_stats['attachment_cache_evicted']} evicted")
+
+# Multi-process mode: a pool of processes migrates whole boards, each process with its own sessions, Planka token and
+# worker threads. They share the SQLite journal; their log lines and timestamps are written by the coordinating process.
+board_process_token = None
+board_process_executor = None
+
+# Function: set up a board process with the settings of the coordinator (processes are spawned, nothing is inherited)
+def init_board_process(settings, message_queue, snapshot_dir):
+    global forward_queue, journal, snapshot_reader, board_process_token, board_process_executor
+    global attachment_executor, attachment_budget, attachment_meter
+    globals().update(settings)
+    forward_queue = message_queue
+    # Trello limits requests per token, so the processes split the allowance of ten seconds (bucket plus refill); every
+    # process needs a bucket of at least one request, which the refill gives back when there are many processes
+    for backend, limits in BACKEND_LIMITS.items():
+        if backend == "trello" and limits.get("rate"):
+            allowance = ((limits.get("burst") or 1) + 10 * limits["rate"]) / BOARD_PROCESSES
+            burst = max(1, (limits.get("burst") or 1) // BOARD_PROCESSES)
+            BACKEND_LIMITS[backend] = dict(limits, rate=max(0.1, allowance - burst) / 10, burst=burst)
+    init_sessions()
+    journal = MigrationJournal(JOURNAL_FILE)  # Already opened (and reset if needed) by the coordinator
+    if snapshot_dir:
+        snapshot_reader = SnapshotReader(snapshot_dir)
+    board_process_token = get_token()
+    if not board_process_token:
+        raise RuntimeError("Failed to obtain a Planka token in a board process")
+    open_planka_db()
+    if CARD_WORKERS > 1:
+        board_process_executor = concurrent.futures.ThreadPoolExecutor(max_workers=CARD_WORKERS)
+    if ATTACHMENT_WORKERS > 1:
+        attachment_executor = concurrent.futures.ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS)
+    attachment_budget = ByteBudget(ATTACHMENT_MAX_INFLIGHT_MB * 1048576)
+    attachment_meter = TransferMeter()
+    open_attachment_cache()
+
+# Function: migrate one board in a board process; returns its statistics, transferred attachments (files, bytes)
+# and request metrics
+def migrate_board_in_process(project, project_name, board, position):
+    run_stats.clear()
+    files, total_bytes = attachment_meter.files, attachment_meter.total_bytes
+    try:
+        migrate_board(board_process_token, project, project_name, board, position, board_process_executor)
+    finally:
+        progress.advance("boards")
+        flush_log()
+    return dict(run_stats), attachment_meter.files - files, attachment_meter.total_bytes - total_bytes, request_metrics.take()
+
+# Function: write the log lines, timestamps, progress and trace events sent by the board processes, until None arrives
+def forward_messages(message_queue):
+    while True:
+        message = message_queue.get()
+        if message is None:
+            return
+        if message[0] == "log":
+            log_message(message[1])
+        elif message[0] == "progress":
+            getattr(progress, message[1])(*message[2:])
+        elif message[0] == "trace":
+            request_metrics.write_trace(message[1])
+        else:
+            record_timestamp(*message[1:])
+
+# Function: distribute boards (project, project name, board, position) over BOARD_PROCESSES processes
+def migrate_boards_in_processes(boards):
+    context = multiprocessing.get_context("spawn")
+    message_queue = context.Queue()
+    forwarder = threading.Thread(target=forward_messages, args=(message_queue,), name="board-process-log", daemon=True)
+    forwarder.start()
+    settings = {name: value for name, value in globals().items() if name.isupper()}
+    snapshot_dir = snapshot_reader.path if snapshot_reader is not None else None
+    log_message(f"Boards are migrated in parallel by {min(BOARD_PROCESSES, len(boards))} processes")
+
+    started = time.monotonic()
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=min(BOARD_PROCESSES, len(boards)), mp_context=context,
+                                                  initializer=init_board_process, initargs=(settings, message_queue, snapshot_dir))
+    try:
+        jobs = {pool.submit(migrate_board_in_process, *board_args): board_args[2] for board_args in boards}
+        for done, job in enumerate(concurrent.futures.as_completed(jobs), 1):
+            stats, files, total_bytes, endpoints = job.result()
+            run_stats.update(stats)
+            request_metrics.merge(endpoints)
+            if files:
+                attachment_meter.record(total_bytes, started, time.monotonic(), files)
+            log_message(f"Board '{jobs[job].get('name')}' finished ({done}/{len(jobs)})")
+    finally:
+        pool.shutdown(cancel_futures=True)
+        message_queue.put(None)
+        forwarder.join()
+
+# Function: outline of a board for counting, in one request: lists, labels, checklist ids and cards with their badges,
+# labels, cover and attachment sizes (from the snapshot when importing)
+def get_board_outline(board_id):
+    if snapshot_reader is not None:
+        snapshot = snapshot_reader.get_board_snapshot(board_id)
+        cards = [card for list_cards in snapshot["cards"].values() for card in list_cards] + snapshot["archived_cards"]
+        return {
+            "lists": snapshot["lists"],
+            "labels": snapshot["labels"],
+            "cards": [dict(card, attachments=snapshot["attachments"].get(card["id"], [])) for card in cards],
+            "checklists": [checklist for checklists in snapshot["checklists"].values() for checklist in checklists],
+        }
+    params = {
+        "fields": "name",
+        "lists": "open",
+        "labels": "all",
+        "label_fields": "name",
+        "labels_limit": 1000,
+        "cards": "all",
+        "card_fields": "idList,closed,dateLastActivity,badges,idLabels,idAttachmentCover",
+        "card_attachments": "true",
+        "card_attachment_fields": "bytes,name,fileName",
+        "checklists": "all",
+        "checklist_fields": "idCard",
+        "checkItems": "none",
+    }
+    response = trello_request("GET", f"boards/{board_id}", params=params)
+    response.raise_for_status()
+    return response.json()
+
+# Function: the lists of a board outline in scope and the cards a migration would visit (changed ones only when syncing)
+def outline_in_scope(outline, since=None):
+    trello_lists = [l for l in outline.get("lists", []) if in_scope(l, INCLUDE_LISTS, EXCLUDE_LISTS)]
+    list_ids = {l["id"] for l in trello_lists}
+    cards = []
+    for card in outline.get("cards", []):
+        if card.get("closed") and SKIP_ARCHIVED_CARDS:
+            continue
+        if not card.get("closed") and card.get("idList") not in list_ids:
+            continue
+        if not card_in_scope(card, list_ids if INCLUDE_LISTS or EXCLUDE_LISTS else None):
+            continue
+        if since and card.get("dateLastActivity", "") <= since:
+            continue
+        cards.append(card)
+    return trello_lists, cards
+
+# Function: count the lists, cards, tasks, comments and attachment bytes in scope, from one request per board
+def precount(workspace_boards):
+    for ws, boards in workspace_boards:
+        for board in boards:
+            progress.add_total("boards")
+            since = journal_get_meta(f"last_sync:{board['id']}") if SYNC_MODE else None
+            if not since and board_complete(board["id"]):
+                continue
+            try:
+                outline = get_board_outline(board["id"])
+            except requests.RequestException as e:
+                log_message(f"Failed to count board '{board.get('name')}': {e}")
+                continue
+
+            trello_lists, cards = outline_in_scope(outline, since)
+            progress.add_total("lists", len(trello_lists) + (0 if SKIP_ARCHIVED_CARDS else 1))
+            for card in cards:
+                badges = card.get("badges", {})
+                size = sum(attachment.get("bytes") or 0 for attachment in attachments_in_scope(card.get("attachments", []), quiet=True))
+                progress.add_card(card["id"], badges.get("checkItems", 0), badges.get("comments", 0), size)
+
+    total = progress.total
+    log_message(f"To migrate: {total['boards']} boards, {total['lists']} lists, {total['cards']} cards, {total['tasks']} tasks, "
+                f"{total['comments']} comments, {total['bytes'] / 1048576:.2f} MB of attachments")
+
+# Function: Main migration from Trello to Planka; returns False if anything failed (a rerun with resume retries it)
+def migrate_workspaces():
+    global attachment_executor, attachment_budget, attachment_meter
+    reset_log()
+    log_message("Starting migration Trello → Planka")
+    run_stats.clear()
+    request_metrics.reset()
+    prepare_output()
+    # Everything opened from here on is closed in the finally block, also when listing the workspaces or boards fails
+    executor = None
+    progress_thread = None
+    stop_progress = threading.Event()
+    board_jobs = []  # Collected for the board processes once all projects exist
+    try:
+        if TRACE:
+            request_metrics.open_trace(TRACE_FILE)
+        init_sessions()
+        resumed = open_journal()
+        open_timestamp_sink(append=resumed)
+
+        if snapshot_reader is not None:
+            log_message(f"Importing the snapshot exported at {snapshot_reader.exported_at} from {snapshot_reader.path}")
+            trello_workspaces = snapshot_reader.workspaces
+        else:
+            trello_workspaces = get_workspaces()
+        log_message(f"Retrieved workspaces: {len(trello_workspaces)}")
+        trello_workspaces = [ws for ws in trello_workspaces if in_scope(ws, INCLUDE_WORKSPACES, EXCLUDE_WORKSPACES, ("id", "name", "displayName"))]
+
+        token = get_token()
+        if token:
+            log_message("Bearer token successfully obtained")
+            open_planka_db()
+        else:
+            log_message("Failed to obtain token")
+            return False
+
+        if CARD_WORKERS > 1:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=CARD_WORKERS)
+            log_message(f"Cards are migrated in parallel by {CARD_WORKERS} workers")
+        if ATTACHMENT_WORKERS > 1:
+            attachment_executor = concurrent.futures.ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS)
+            log_message(f"Attachments are transferred in parallel by {ATTACHMENT_WORKERS} workers")
+        attachment_budget = ByteBudget(ATTACHMENT_MAX_INFLIGHT_MB * 1048576)
+        attachment_meter = TransferMeter()
+        open_attachment_cache()
+
+        # Boards are listed up front, so everything can be counted before it is migrated
+        workspace_boards = []
+        for ws in trello_workspaces:
+            boards = snapshot_reader.get_boards(ws["id"]) if snapshot_reader is not None else get_boards(ws["id"])
+            workspace_boards.append((ws, [board for board in boards if in_scope(board, INCLUDE_BOARDS, EXCLUDE_BOARDS)]))
+        progress.reset()
+        if PRECOUNT:
+            precount(workspace_boards)
+        if PROGRESS_BAR:
+            progress_thread = threading.Thread(target=show_progress, args=(stop_progress,), name="progress", daemon=True)
+            progress_thread.start()
+
+        for ws, boards in workspace_boards:
+            log_message(f"\nMigrating workspace: {ws.get('displayName')}")
+            project_id = journal_get("project", ws["id"])
+            if project_id:
+                project = {"id": project_id}
+            else:
+                project = create_planka_project(ws, token)
+                if not project:
+                    log_message(f"Failed to create project for workspace: {ws.get('displayName')}")
+                    count_stat("projects_failed")
+                    continue
+                journal_put("project", ws["id"], project["id"])
+
+            log_message(f"Boards found: {len(boards)}")
+
+            for idx, board in enumerate(boards):
+                position = (idx + 1) * 65536
+                if BOARD_PROCESSES > 1:
+                    board_jobs.append((project, ws["displayName"], board, position))
+                else:
+                    migrate_board(token, project, ws["displayName"], board, position, executor)
+                    progress.advance("boards")
+
+        if board_jobs:
+            migrate_boards_in_processes(board_jobs)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if attachment_executor is not None:
+            attachment_executor.shutdown(cancel_futures=True)
+            attachment_executor = None
+        close_sessions()
+        close_journal()
+        close_timestamp_sink()
+        close_planka_db()
+        close_attachment_cache()
+        if progress_thread is not None:
+            stop_progress.set()
+            progress_thread.join()
+        request_metrics.close_trace()
+        flush_log()
+
+    log_message("\nMigration completed")
+    log_run_summary()
+    write_run_report(request_metrics.started)
+    flush_log()
+    return not (run_stats["boards_failed"] or run_stats["projects_failed"])
+
+# Function: download one attachment into the snapshot, returns its size (None if it failed); files already there are kept
+def export_attachment(snapshot_dir, card_id_trello, attachment):
+    file_path = snapshot_attachment_path(snapshot_dir, attachment)
+    if os.path.exists(file_path) and os.path.getsize(file_path) == attachment.get("bytes"):
+        return attachment["bytes"]
+    if not download_attachment(card_id_trello, attachment, file_path + ".part"):
+        return None
+    os.replace(file_path + ".part", file_path)
+    return os.path.getsize(file_path)
+
+# Function: export all Trello workspaces (JSON Lines plus attachment files) into a snapshot for a later import;
+# returns False if an attachment could not be saved
+def export_snapshot(snapshot_dir=None):
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    reset_log()
+    log_message(f"Exporting Trello into {snapshot_dir}")
+    run_stats.clear()
+    request_metrics.reset()
+    prepare_output()
+    writer = None
+    downloader = concurrent.futures.ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS)
+    downloads = []
+
+    try:
+        if TRACE:
+            request_metrics.open_trace(TRACE_FILE)
+        init_sessions()
+        writer = SnapshotWriter(snapshot_dir)
+        for ws in get_workspaces():
+            if not in_scope(ws, INCLUDE_WORKSPACES, EXCLUDE_WORKSPACES, ("id", "name", "displayName")):
+                continue
+            writer.write("workspace", ws)
+            boards = [board for board in get_boards(ws["id"]) if in_scope(board, INCLUDE_BOARDS, EXCLUDE_BOARDS)]
+            log_message(f"\nExporting workspace: {ws.get('displayName')} ({len(boards)} boards)")
+
+            for board in boards:
+                writer.write("board", board, workspace=ws["id"])
+                nested, comments = fetch_board(board["id"])
+                for record_type, key in (("list", "lists"), ("label", "labels"), ("card", "cards"), ("checklist", "checklists")):
+                    for item in nested.get(key, []):
+                        writer.write(record_type, item)
+                for comment in comments:
+                    writer.write("comment", comment)
+
+                # Attachments download in the background while the next boards are fetched
+                for card in nested.get("cards", []):
+                    for attachment in attachments_in_scope(card.get("attachments", [])):
+                        downloads.append(downloader.submit(export_attachment, snapshot_dir, card["id"], attachment))
+                log_message(f"Board '{board.get('name')}' exported: {len(nested.get('cards', []))} cards, {len(comments)} comments")
+
+        sizes = [job.result() for job in downloads]
+        writer.finish()
+    finally:
+        downloader.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.close()
+        close_sessions()
+        request_metrics.close_trace()
+
+    log_message("\nExport completed: " + ", ".join(f"{count} {record_type}s" for record_type, count in writer.counts.items()))
+    saved = [size for size in sizes if size is not None]
+    log_message(f"Attachments: {len(saved)} of {len(sizes)} saved, {sum(saved) / 1048576:.2f} MB")
+    write_run_report(request_metrics.started)
+    flush_log()
+    return len(saved) == len(sizes)
+
+# Function: replay a snapshot made by export_snapshot into Planka, without any Trello request (or plan it, with task)
+def import_snapshot(snapshot_dir=None, task=None):
+    global snapshot_reader
+    snapshot_reader = SnapshotReader(snapshot_dir or SNAPSHOT_DIR)
+    try:
+        return (task or migrate_workspaces)()
+    finally:
+        snapshot_reader.close()
+        snapshot_reader = None
+
+
+
+# Dry run: what a migration would do, from the Trello metadata only (one request per board, no attachment download,
+# nothing written to Planka or to the journal), with the requests per board and an estimated duration
+
+# Function: requests and volume a migration of one board would need, from its outline
+def plan_board(board, outline, since=None):
+    trello_lists, cards = outline_in_scope(outline, since)
+    checklists = collections.Counter(checklist.get("idCard") for checklist in outline.get("checklists", []))
+    plan = collections.Counter(lists=len(trello_lists) + (0 if SKIP_ARCHIVED_CARDS else 1), cards=0)
+    if not journal_get("board", board["id"]):
+        plan["labels"] = len(outline.get("labels", []))
+    # Cards out of scope are still read with their list
+    archived_cards = sum(card.get("closed", False) for card in outline.get("cards", []))
+    downloads = set()
+    for card in cards:
+        # Cards completed by a previous run are skipped by the migration, in sync mode unless they had activity since
+        synced = since is not None and journal_get("card", card["id"]) is not None
+        if card_complete(card["id"]) and (not synced or card.get("dateLastActivity", "") <= since):
+            plan["cards_done"] += 1
+            continue
+        badges = card.get("badges", {})
+        plan["cards"] += 1
+        attachments = attachments_in_scope(card.get("attachments", []), quiet=True)
+        plan["checklists"] += checklists[card["id"]]
+        plan["tasks"] += badges.get("checkItems", 0)
+        plan["comments"] += badges.get("comments", 0)
+        plan["card_labels"] += len(card.get("idLabels", []))
+        plan["attachments"] += len(attachments)
+        plan["attachment_bytes"] += sum(attachment.get("bytes") or 0 for attachment in attachments)
+        plan["covers"] += bool(card.get("idAttachmentCover") and attachments)
+        for attachment in attachments:
+            # With the attachment cache, a file with the same name and size is downloaded once
+            key = AttachmentCache.keys(attachment)[-1] if ATTACHMENT_CACHE_MB else attachment.get("id")
+            downloads.add(key)
+        if snapshot_reader is None and not BULK_FETCH:
+            plan["trello_requests"] += 1 + badges.get("comments", 0) // 50 + 1 + (badges.get("attachments") != 0)
+
+    # Planka: board, labels, lists, then per card the card, its labels, task lists, tasks, comments, attachments and cover
+    database_rows = plan["checklists"] + plan["tasks"] + plan["comments"] if PLANKA_DSN and psycopg2 is not None else 0
+    plan["planka_requests"] = (
+        (0 if journal_get("board", board["id"]) else 1) + plan["labels"] + plan["lists"] + plan["cards"] + plan["card_labels"]
+        + plan["checklists"] + plan["tasks"] + plan["comments"] - database_rows + plan["attachments"] + plan["covers"]
+    )
+    plan["database_rows"] = database_rows
+
+    # Trello: the board itself (nested or list by list), comment pages in bulk mode, and the attachment downloads
+    if snapshot_reader is None:
+        if BULK_FETCH:
+            plan["trello_requests"] += 1 + plan["comments"] // 1000 + 1
+        else:
+            plan["trello_requests"] += 2 + len(trello_lists)
+            if not SKIP_ARCHIVED_CARDS:
+                plan["trello_requests"] += archived_cards // CARD_PAGE_SIZE + 1
+        plan["trello_requests"] += len(downloads)
+        plan["downloads"] = len(downloads)
+    return plan
+
+# Function: median duration of a few requests that change nothing in Planka (the answer does not matter), in seconds
+def measure_planka_latency(samples=3):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        try:
+            planka_request("GET", "users/me", retry=False).close()
+        except requests.RequestException:
+            return None
+        durations.append(time.perf_counter() - started)
+    return sorted(durations)[len(durations) // 2]
+
+# Function: plan the migration without migrating anything; writes output/plan.json and the summary to the log.
+# Returns False if a board could not be read
+def plan_migration():
+    global journal
+    reset_log()
+    log_message("Planning the migration (dry run: nothing is written to Planka and no attachment is downloaded)")
+    run_stats.clear()
+    request_metrics.reset()
+    prepare_output()
+    boards_plan = []
+    unread = 0
+    # Outside the boards: the Planka login, a project per new workspace and the Trello workspace and board listings
+    totals = collections.Counter(planka_requests=1, trello_requests=0 if snapshot_reader is not None else 1)
+    try:
+        init_sessions()
+        # The journal of a previous run is only read, for what a resumed or synced migration would skip
+        if (RESUME or SYNC_MODE) and os.path.exists(JOURNAL_FILE):
+            journal = MigrationJournal(JOURNAL_FILE)
+            if journal.get_meta("planka_url") not in (None, PLANKA_URL):
+                close_journal()
+
+        workspaces = snapshot_reader.workspaces if snapshot_reader is not None else get_workspaces()
+        for ws in workspaces:
+            if not in_scope(ws, INCLUDE_WORKSPACES, EXCLUDE_WORKSPACES, ("id", "name", "displayName")):
+                continue
+            totals["planka_requests"] += 0 if journal_get("project", ws["id"]) else 1
+            totals["trello_requests"] += 0 if snapshot_reader is not None else 1
+            boards = snapshot_reader.get_boards(ws["id"]) if snapshot_reader is not None else get_boards(ws["id"])
+            for board in boards:
+                if not in_scope(board, INCLUDE_BOARDS, EXCLUDE_BOARDS):
+                    continue
+                since = journal_get_meta(f"last_sync:{board['id']}") if SYNC_MODE else None
+                if not since and board_complete(board["id"]):
+                    log_message(f"Board '{board.get('name')}' already migrated, skipped")
+                    continue
+                try:
+                    outline = get_board_outline(board["id"])
+                except requests.RequestException as e:
+                    log_message(f"Failed to read board '{board.get('name')}': {e}")
+                    unread += 1
+                    continue
+                plan = plan_board(board, outline, since)
+                boards_plan.append({"workspace": ws.get("displayName"), "board": board.get("name"), "id": board["id"], **plan})
+                done = f" ({plan['cards_done']} already migrated)" if plan["cards_done"] else ""
+                log_message(f"Board '{board.get('name')}': {plan['cards']} cards{done}, {plan['tasks']} tasks, {plan['comments']} comments, "
+                            f"{plan['attachments']} attachments ({plan['attachment_bytes'] / 1048576:.2f} MB); "
+                            f"requests: Planka {plan['planka_requests']}, Trello {plan['trello_requests']}")
+        planka_latency = measure_planka_latency() if PLANKA_URL else None
+    finally:
+        close_sessions()
+        close_journal()
+
+    # Duration: requests spread over the card workers of all board processes, Trello also bounded by its rate limit.
+    # With prefetching (or a bulk fetch) reads overlap writes, otherwise they add up. Attachment bandwidth is not included.
+    # The board outline read here is much heavier than the other Trello requests, so only the counting request and the
+    # nested board read of a bulk fetch take its latency; the rest take that of the workspace and board listings
+    latencies = request_metrics.report()
+    outline_latency = latencies.get("GET boards/{id}", {}).get("p50_seconds")
+    listings = sorted(stats["p50_seconds"] for name, stats in latencies.items() if stats["backend"] == "trello" and name != "GET boards/{id}")
+    trello_latency = listings[len(listings) // 2] if listings else outline_latency
+    heavy_requests = 0
+    if snapshot_reader is None:
+        heavy_requests = len(boards_plan) * (bool(PRECOUNT) + bool(BULK_FETCH))
+    if PRECOUNT and snapshot_reader is None:
+        totals["trello_requests"] += len(boards_plan)  # The counting request per board
+    for plan in boards_plan:
+        totals.update({key: value for key, value in plan.items() if isinstance(value, int)})
+    workers = max(1, CARD_WORKERS) * max(1, BOARD_PROCESSES)
+    trello_seconds = ((totals["trello_requests"] - heavy_requests) * (trello_latency or 0)
+                      + heavy_requests * (outline_latency or 0)) / workers
+    if BACKEND_LIMITS["trello"].get("rate"):
+        trello_seconds = max(trello_seconds, totals["trello_requests"] / BACKEND_LIMITS["trello"]["rate"])
+    planka_seconds = totals["planka_requests"] * (planka_latency or trello_latency or 0) / workers
+    overlapped = PREFETCH_CARDS or BULK_FETCH or snapshot_reader is not None
+    estimate = max(trello_seconds, planka_seconds) if overlapped else trello_seconds + planka_seconds
+
+    with open(PLAN_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "boards": boards_plan,
+            "totals": dict(totals),
+            "latency_seconds": {"trello": trello_latency, "trello_board_outline": outline_latency, "planka": planka_latency},
+            "workers": workers,
+            "estimated_seconds": round(estimate, 1),
+        }, f, ensure_ascii=False, indent=2)
+
+    done = f" ({totals['cards_done']} already migrated)" if totals["cards_done"] else ""
+    log_message(f"\nPlan: {len(boards_plan)} boards, {totals['lists']} lists, {totals['cards']} cards{done}, {totals['tasks']} tasks, "
+                f"{totals['comments']} comments, {totals['attachments']} attachments ({totals['attachment_bytes'] / 1048576:.2f} MB)")
+    log_message(f"Requests: Planka {totals['planka_requests']}, Trello {totals['trello_requests']}"
+                + (f", rows inserted into the Planka database: {totals['database_rows']}" if totals["database_rows"] else ""))
+    latency_text = ", ".join(f"{name} {value * 1000:.0f} ms" for name, value in (
+        ("Trello", trello_latency), ("Trello board outline", outline_latency), ("Planka", planka_latency)) if value)
+    log_message(f"Estimated duration with {workers} workers: {datetime.timedelta(seconds=int(estimate))} "
+                f"(latency {latency_text or 'unknown'}, without attachment transfer time)")
+    log_message(f"Plan: {PLAN_FILE}")
+    flush_log()
+    return not unread
+
+
+
+# Function: REQUEST_TIMEOUT from "300" (both timeouts) or "15,300" (connect, read), in seconds
+def request_timeout(value):
+    parts = [float(part) for part in (value if isinstance(value, (list, tuple)) else str(value).split(","))]
+    if len(parts) not in (1, 2):
+        raise ValueError("expected seconds or connect,read seconds")
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+# Command line: python -m migrator [migrate|export|import] [options]
+# Settings are read from a JSON config file, then from environment variables, then from the options, each overriding the previous
+CLI_SETTINGS = {
+    # option (config key, upper case = environment variable): (module setting, type, help);
+    # a tuple setting names a key of a dict setting, e.g. BACKEND_LIMITS["trello"]["rate"]
+    "planka_url": ("PLANKA_URL", str, "Planka URL, e.g. https://planka.example.com"),
+    "planka_username": ("USERNAME", str, "Planka username or email"),
+    "planka_password": ("PASSWORD", str, "Planka password (prefer the config file or the environment)"),
+    "trello_apikey": ("APIKEY", str, "Trello API key"),
+    "trello_apitoken": ("APITOKEN", str, "Trello API token"),
+    "card_workers": ("CARD_WORKERS", int, "cards migrated in parallel"),
+    "card_page_size": ("CARD_PAGE_SIZE", int, "cards per request when reading an archive (max 1000)"),
+    "prefetch_cards": ("PREFETCH_CARDS", int, "cards read from Trello ahead of their Planka writes (0 = off)"),
+    "prefetch_workers": ("PREFETCH_WORKERS", int, "threads reading cards ahead"),
+    "board_processes": ("BOARD_PROCESSES", int, "boards migrated in parallel by separate processes"),
+    "precount": ("PRECOUNT", bool, "count everything first for the progress and ETA (one request per board)"),
+    "progress_bar": ("PROGRESS_BAR", bool, "show a progress bar (default: when running in a terminal)"),
+    "trace": ("TRACE", bool, "write every request to output/trace.json (Chrome trace format)"),
+    "attachment_workers": ("ATTACHMENT_WORKERS", int, "attachments transferred in parallel"),
+    "attachment_max_inflight_mb": ("ATTACHMENT_MAX_INFLIGHT_MB", int, "total size of the attachments in flight, MB"),
+    "attachment_cache_mb": ("ATTACHMENT_CACHE_MB", int, "size of the attachment cache in output/attachment_cache, MB (0 = off)"),
+    "attachment_cache_by_name": ("ATTACHMENT_CACHE_BY_NAME", bool,
+                                 "reuse cached files for attachments with the same name and size (lossy: a different file "
+                                 "with the same name and size gets the cached content)"),
+    "pool_size": ("POOL_SIZE", int, "kept-alive connections per backend"),
+    "trello_rate": (("BACKEND_LIMITS", "trello", "rate"), float, "Trello requests per second (0 = unlimited)"),
+    "trello_burst": (("BACKEND_LIMITS", "trello", "burst"), int, "Trello requests allowed at once before the rate applies"),
+    "trello_retries": (("BACKEND_LIMITS", "trello", "retries"), int, "retries of a failed Trello request"),
+    "planka_rate": (("BACKEND_LIMITS", "planka", "rate"), float, "Planka requests per second (0 = unlimited)"),
+    "planka_burst": (("BACKEND_LIMITS", "planka", "burst"), int, "Planka requests allowed at once before the rate applies"),
+    "planka_retries": (("BACKEND_LIMITS", "planka", "retries"), int, "retries of a failed Planka request"),
+    "planka_verify_ssl": ("PLANKA_VERIFY_SSL", bool, "verify the certificate of Planka"),
+    "request_timeout": ("REQUEST_TIMEOUT", request_timeout, "seconds to wait for a response, or connect,read seconds"),
+    "bulk_fetch": ("BULK_FETCH", bool, "fetch each board with a few nested requests"),
+    "stream_attachments": ("STREAM_ATTACHMENTS", bool, "pipe attachments from Trello straight into Planka"),
+    "save_attachment_copy": ("SAVE_ATTACHMENT_COPY", bool, "keep a copy of every attachment in output/attachments"),
+    "save_responses": ("SAVE_RESPONSES", bool, "write every Trello response to output as JSON (for debugging)"),
+    "resume": ("RESUME", bool, "continue from the journal of the previous run"),
+    "sync_mode": ("SYNC_MODE", bool, "only push what changed since the previous run"),
+    "log_level": ("LOG_LEVEL", str, "entity (every created entity) or summary"),
+    "timestamp_format": ("TIMESTAMP_FORMAT", str, "sql or csv"),
+    "timestamp_batch_size": ("TIMESTAMP_BATCH_SIZE", int, "rows per timestamp UPDATE"),
+    "timestamp_dsn": ("TIMESTAMP_DSN", str, "PostgreSQL DSN of the Planka database to apply the timestamps to"),
+    "planka_dsn": ("PLANKA_DSN", str, "PostgreSQL DSN of the Planka database for direct inserts"),
+    "planka_db_page_size": ("PLANKA_DB_PAGE_SIZE", int, "rows per INSERT statement"),
+    "snapshot_dir": ("SNAPSHOT_DIR", str, "folder of the offline snapshot"),
+    "include_workspaces": ("INCLUDE_WORKSPACES", list, "comma-separated workspace ids or names to migrate"),
+    "exclude_workspaces": ("EXCLUDE_WORKSPACES", list, "comma-separated workspace ids or names to leave out"),
+    "include_boards": ("INCLUDE_BOARDS", list, "comma-separated board ids or names to migrate"),
+    "exclude_boards": ("EXCLUDE_BOARDS", list, "comma-separated board ids or names to leave out"),
+    "include_lists": ("INCLUDE_LISTS", list, "comma-separated list names or ids to migrate"),
+    "exclude_lists": ("EXCLUDE_LISTS", list, "comma-separated list names or ids to leave out"),
+    "cards_active_since": ("CARDS_ACTIVE_SINCE", iso_date, "only cards with activity on or after YYYY-MM-DD"),
+    "cards_active_until": ("CARDS_ACTIVE_UNTIL", iso_date, "only cards with activity on or before YYYY-MM-DD"),
+    "skip_archived_cards": ("SKIP_ARCHIVED_CARDS", bool, "leave out archived cards"),
+    "max_attachment_mb": ("MAX_ATTACHMENT_MB", float, "skip attachments larger than this, MB"),
+}
+
+# Function: convert a config or environment value to the type of the setting
+def parse_setting(kind, value):
+    if kind is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if kind is list and isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return kind(value)
+
+# Function: set the module setting of an option (a key of a dict setting for a tuple)
+def apply_setting(option, value):
+    setting, kind, _ = CLI_SETTINGS[option]
+    value = parse_setting(kind, value) if value is not None else None
+    if isinstance(setting, tuple):
+        target = globals()[setting[0]]
+        for key in setting[1:-1]:
+            target = target[key]
+        target[setting[-1]] = value
+    else:
+        globals()[setting] = value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrator", description="Migrate Trello workspaces to Planka v2.x without the GUI.")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "export", "import"],
+                        help="migrate (default), export a Trello snapshot, or import a snapshot into Planka")
+    parser.add_argument("--config", help="JSON file with settings, keyed like the options (e.g. \"card_workers\": 8)")
+    parser.add_argument("--plan", action="store_true", help="dry run: count what would be migrated and estimate the requests and the duration")
+    for option, (_, kind, help_text) in CLI_SETTINGS.items():
+        flag = "--" + option.replace("_", "-")
+        if kind is bool:
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction, default=None, help=help_text)
+        else:
+            parser.add_argument(flag, type=str if kind is list else kind, default=None, help=help_text)
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as config_file:
+            settings.update(json.load(config_file))
+        unknown = sorted(set(settings) - set(CLI_SETTINGS))
+        if unknown:
+            parser.error(f"unknown settings in {args.config}: {', '.join(unknown)}")
+    for option in CLI_SETTINGS:
+        if os.environ.get(option.upper()):
+            settings[option] = os.environ[option.upper()]
+        if getattr(args, option) is not None:
+            settings[option] = getattr(args, option)
+
+    global PROGRESS_BAR
+    PROGRESS_BAR = sys.stderr is not None and sys.stderr.isatty()
+    for option, value in settings.items():
+        try:
+            apply_setting(option, value)
+        except ValueError as e:
+            parser.error(f"invalid value for {option}: {value!r} ({e})")
+
+    required = {"migrate": ("planka_url", "planka_username", "planka_password", "trello_apikey", "trello_apitoken"),
+                "export": ("trello_apikey", "trello_apitoken"),
+                "import": ("planka_url", "planka_username", "planka_password")}[args.command]
+    if args.plan:
+        required = {"migrate": ("trello_apikey", "trello_apitoken"), "export": ("trello_apikey", "trello_apitoken"), "import": ()}[args.command]
+    missing = [option for option in required if not settings.get(option)]
+    if missing:
+        parser.error("missing settings: " + ", ".join(missing))
+
+    global PLANKA_URL
+    PLANKA_URL = PLANKA_URL.rstrip("/")
+    if PLANKA_URL and not PLANKA_URL.endswith("/api"):
+        PLANKA_URL += "/api"
+
+    # A run that left something out exits with 1, so cron jobs and containers see it
+    if args.plan and args.command == "import":
+        succeeded = import_snapshot(task=plan_migration)
+    elif args.plan:
+        succeeded = plan_migration()
+    elif args.command == "export":
+        succeeded = export_snapshot()
+    elif args.command == "import":
+        succeeded = import_snapshot()
+    else:
+        succeeded = migrate_workspaces()
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,12 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, ttk
 import migrator
 import os
 from migrator import log_message
 import webbrowser
 import threading
 import traceback
+import queue
 
 # Global variables (used by migrator.py)
 PLANKA_URL = ""
@@ -15,8 +16,8 @@ APIKEY = ""
 APITOKEN = ""
 TRELLO_URL = "https://api.trello.com/1/"  # constant
 
-# Start migration and pass input values
-def start_migration():
+# Start migration (or the snapshot export/import given as task) and pass input values
+def start_migration(task=None):
     global PLANKA_URL, USERNAME, PASSWORD, APIKEY, APITOKEN
 
     PLANKA_URL = planka_url_entry.get().strip()
@@ -34,32 +35,64 @@ def start_migration():
     migrator.APIKEY = APIKEY
     migrator.APITOKEN = APITOKEN
     migrator.TRELLO_URL = TRELLO_URL
-    migrator.log_gui = lambda msg: log_box.insert(tk.END, msg + "\n") or log_box.see(tk.END)
+    migrator.CARD_WORKERS = read_int(card_workers_spinbox, 1)
+    migrator.BULK_FETCH = bulk_fetch_var.get()
+    migrator.STREAM_ATTACHMENTS = stream_attachments_var.get()
+    migrator.SAVE_ATTACHMENT_COPY = save_attachment_copy_var.get()
+    migrator.ATTACHMENT_WORKERS = read_int(attachment_workers_spinbox, 1)
+    migrator.RESUME = resume_var.get()
+    migrator.SYNC_MODE = sync_var.get()
+    migrator.LOG_LEVEL = "entity" if log_entities_var.get() else "summary"
+    migrator.log_gui = gui_log_queue.put  # Called from the log writer thread, shown by poll_log on the Tk thread
 
     log_box.delete("1.0", tk.END)
 
     def run_migration():
         while True:
             try:
-                migrator.migrate_workspaces()
-                log_box.see(tk.END)
-                messagebox.showinfo("Done", "Migration completed successfully.")
+                (task or migrator.migrate_workspaces)()
+                messagebox.showinfo("Done", "Completed successfully.")
                 break
             except Exception as e:
                 tb = traceback.format_exc()
-                log_box.insert(tk.END, f"Error:\n{tb}\n")
-                log_box.see(tk.END)
+                migrator.flush_log()
+                gui_log_queue.put(f"Error:\n{tb}")
                 result = messagebox.askretrycancel(
                     "Error",
                     f"Something went wrong:\n{str(e)}\n\nFull traceback is shown in the log.\n\nRetry (try again) or Cancel (ignore this error and continue)?"
                 )
                 if result:
+                    migrator.RESUME = True  # Continue from the journal instead of creating duplicates
                     continue  # Retry the operation
                 else:
                     break     # Ignore the error and continue
 
     threading.Thread(target=run_migration).start()
 
+# Read a positive integer option, falling back to the default on invalid input
+def read_int(widget, default):
+    try:
+        return max(1, int(widget.get()))
+    except ValueError:
+        return default
+
+# Move queued log lines into the log box, a batch at a time, and refresh the progress, on the Tk thread
+gui_log_queue = queue.Queue()
+
+def poll_log():
+    lines = []
+    try:
+        while True:
+            lines.append(gui_log_queue.get_nowait())
+    except queue.Empty:
+        pass
+    if lines:
+        log_box.insert(tk.END, "\n".join(lines) + "\n")
+        log_box.see(tk.END)
+    progress_bar["value"] = migrator.progress.fraction() * 100
+    progress_label.config(text=migrator.progress.status())
+    window.after(100, poll_log)
+
 # Save log to file
 def save_log():
     file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")])
@@ -87,7 +120,7 @@ def add_entry_context_menu(entry):
 # GUI layout
 window = tk.Tk()
 window.title("Trello to Planka Migrator")
-window.geometry("700x670")
+window.geometry("700x780")
 
 fields = [
     ("Planka URL (without /api):", os.getenv("PLANKA_URL", "https://planka.com")),
@@ -112,16 +145,55 @@ planka_url_entry, username_entry, password_entry, apikey_entry, apitoken_entry =
 for entry in entries:
     add_entry_context_menu(entry)
 
+# Migration options
+options_frame = tk.Frame(window)
+options_frame.pack(pady=3, anchor="w")
+tk.Label(options_frame, text="Parallel card workers:", width=25, anchor="w").pack(side="left")
+card_workers_spinbox = tk.Spinbox(options_frame, from_=1, to=32, width=5)
+card_workers_spinbox.delete(0, tk.END)
+card_workers_spinbox.insert(0, os.getenv("CARD_WORKERS", "1"))
+card_workers_spinbox.pack(side="left")
+bulk_fetch_var = tk.BooleanVar(value=os.getenv("BULK_FETCH", "") == "1")
+tk.Checkbutton(options_frame, text="Bulk board fetch", variable=bulk_fetch_var).pack(side="left", padx=10)
+resume_var = tk.BooleanVar(value=os.getenv("RESUME", "1") == "1")
+tk.Checkbutton(options_frame, text="Resume previous run", variable=resume_var).pack(side="left")
+sync_var = tk.BooleanVar(value=os.getenv("SYNC_MODE", "") == "1")
+tk.Checkbutton(options_frame, text="Sync changes only", variable=sync_var).pack(side="left", padx=10)
+log_entities_var = tk.BooleanVar(value=os.getenv("LOG_LEVEL", "entity") == "entity")
+tk.Checkbutton(options_frame, text="Detailed log", variable=log_entities_var).pack(side="left")
+
+attachment_options_frame = tk.Frame(window)
+attachment_options_frame.pack(pady=3, anchor="w")
+tk.Label(attachment_options_frame, text="Parallel attachment workers:", width=25, anchor="w").pack(side="left")
+attachment_workers_spinbox = tk.Spinbox(attachment_options_frame, from_=1, to=32, width=5)
+attachment_workers_spinbox.delete(0, tk.END)
+attachment_workers_spinbox.insert(0, os.getenv("ATTACHMENT_WORKERS", "1"))
+attachment_workers_spinbox.pack(side="left")
+stream_attachments_var = tk.BooleanVar(value=os.getenv("STREAM_ATTACHMENTS", "") == "1")
+tk.Checkbutton(attachment_options_frame, text="Stream attachments", variable=stream_attachments_var).pack(side="left", padx=10)
+save_attachment_copy_var = tk.BooleanVar(value=os.getenv("SAVE_ATTACHMENT_COPY", "1") == "1")
+tk.Checkbutton(attachment_options_frame, text="Keep a local copy", variable=save_attachment_copy_var).pack(side="left")
+
 # Buttons
 btn_frame = tk.Frame(window)
 btn_frame.pack(pady=10)
 
 tk.Button(btn_frame, text="Start Migration", command=start_migration).pack(side="left", padx=10)
+tk.Button(btn_frame, text="Export Snapshot", command=lambda: start_migration(migrator.export_snapshot)).pack(side="left", padx=10)
+tk.Button(btn_frame, text="Import Snapshot", command=lambda: start_migration(migrator.import_snapshot)).pack(side="left", padx=10)
+tk.Button(btn_frame, text="Plan", command=lambda: start_migration(migrator.plan_migration)).pack(side="left", padx=10)
 tk.Button(btn_frame, text="Save Log", command=save_log).pack(side="left", padx=10)
 
+# Progress
+progress_bar = ttk.Progressbar(window, length=680, maximum=100)
+progress_bar.pack(padx=10)
+progress_label = tk.Label(window, text="", anchor="w", font=("Consolas", 9))
+progress_label.pack(padx=10, anchor="w")
+
 # Log box
 log_box = scrolledtext.ScrolledText(window, width=90, height=25, font=("Consolas", 10))
 log_box.pack(padx=10, pady=10)
+poll_log()
 
 # Support link
 def open_support_link():